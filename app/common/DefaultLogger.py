@@ -1,40 +1,175 @@
+import atexit
+import datetime as dt
+import json
 import logging
 import os
+import queue
 import sys
+import threading
+from contextvars import ContextVar
 from logging import StreamHandler
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, RotatingFileHandler
+from typing import Optional
 from app import project_path
 
 log_path = os.path.join(project_path, "log")
 
 # Logger configuration:
 rotating_file_handler = {"maxBytes": 500000, "backupCount": 5, "mode": "a"}
+# records waiting for the writer thread (the new ones are dropped when it is full) and records written per batch
+log_queue_size = 10000
+log_batch_size = 256
 
+# id of the request being handled, added to every record logged while handling it
+request_id_var: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
 
-def configure_logger(log_name: str = None, with_time: bool = True, level: logging = logging.INFO) -> logging.Logger:
+# attributes of every LogRecord: the other ones come from extra and are written as fields of the JSON line
+_record_attributes = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'log_target'}
+
+_STOP = object()
+_handlers_by_logger = dict()
+_stdout_handler = None
+_log_queue = None
+_writer = None
+_configure_lock = threading.Lock()
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """ One JSON object per record: time, level, logger, message, request_id and the extra fields of the record """
+
+    def __init__(self, with_time: bool = True):
+        super().__init__()
+        self.with_time = with_time
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = dict()
+        if self.with_time:
+            line['time'] = dt.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds')
+        line['level'] = record.levelname
+        line['logger'] = record.name
+        line['message'] = record.getMessage()
+        line.update((key, value) for key, value in vars(record).items() if key not in _record_attributes)
+        return json.dumps(line, default=str)
+
+
+class BatchFlushMixin:
+    # the writer thread flushes once per batch instead of once per record
+    def flush(self):
+        pass
+
+    def flushBatch(self):
+        super().flush()
+
+
+class BatchRotatingFileHandler(BatchFlushMixin, RotatingFileHandler):
+    pass
+
+
+class BatchStreamHandler(BatchFlushMixin, StreamHandler):
+    pass
+
+
+class LoggerQueueHandler(QueueHandler):
+    """ Handler of a configured logger: the records are prepared in the calling thread and queued """
+
+    def __init__(self, log_queue: queue.Queue, log_target: str):
+        super().__init__(log_queue)
+        self.log_target = log_target
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.log_target = self.log_target
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = request_id_var.get()
+        return record
 
+    def enqueue(self, record: logging.LogRecord):
+        # logging never blocks the request: when the writer is behind, the record is lost
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogWriter(threading.Thread):
+    """ Background thread that writes the queued records of all the loggers of the process in batches """
+
+    def __init__(self, log_queue: queue.Queue, batch_size: int = log_batch_size):
+        super().__init__(name='log-writer', daemon=True)
+        self.log_queue = log_queue
+        self.batch_size = batch_size
+
+    def run(self):
+        stop = False
+        while not stop:
+            batch = [self.log_queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stop = True
+                batch = [record for record in batch if record is not _STOP]
+            self.write(batch)
+
+    @staticmethod
+    def write(batch: list):
+        written = dict()
+        for record in batch:
+            for handler in _handlers_by_logger.get(record.log_target, ()):
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+                    written[id(handler)] = handler
+        for handler in written.values():
+            try:
+                handler.flushBatch()
+            except Exception:
+                pass
+
+
+def stop_log_writer():
+    # writes what is still queued (registered at exit)
+    global _writer
+    if _writer is not None:
+        _log_queue.put(_STOP)
+        _writer.join(timeout=5)
+        _writer = None
+
+
+def start_log_writer():
+    global _log_queue, _writer, _stdout_handler
+    if _writer is not None:
+        return
+    _log_queue = queue.Queue(maxsize=log_queue_size)
+    _stdout_handler = BatchStreamHandler(sys.stdout)
+    _stdout_handler.setFormatter(logging.Formatter('%(levelname)s - [%(asctime)s] - %(message)s'))
+    _writer = LogWriter(_log_queue)
+    _writer.start()
+    atexit.register(stop_log_writer)
+
+
+def configure_logger(log_name: str = None, with_time: bool = True, level: logging = logging.INFO) -> logging.Logger:
+    """
+    Logger that writes JSON lines in log/<log_name> (and text in stdout) from a background thread. Calling it
+    again for the same log_name returns the same logger: every logger has a single (queue) handler
+    """
     if log_name is None:
         log_name = "Default.log"
-    if not os.path.exists(log_path):
-        os.makedirs(log_path)
-
-    log_file_name = os.path.join(log_path, log_name)
-    rotating_file_handler["filename"] = log_file_name
     logger = logging.getLogger(log_name)
-    if with_time:
-        formatter = logging.Formatter('%(levelname)s - [%(asctime)s] - %(message)s')
-    else:
-        formatter = logging.Formatter('%(levelname)s - %(message)s')
-
-    # creating rotating and stream Handler
-    r_handler = RotatingFileHandler(**rotating_file_handler)
-    r_handler.setFormatter(formatter)
-    s_handler = StreamHandler(sys.stdout)
-    # adding handlers:
-    logger.addHandler(r_handler)
-    logger.addHandler(s_handler)
-
-    # setting logger in class
     logger.setLevel(level)
-    return logger
 
+    with _configure_lock:
+        if log_name in _handlers_by_logger:
+            return logger
+        if not os.path.exists(log_path):
+            os.makedirs(log_path)
+        start_log_writer()
+
+        log_file_name = os.path.join(log_path, log_name)
+        r_handler = BatchRotatingFileHandler(filename=log_file_name, **rotating_file_handler)
+        r_handler.setFormatter(JsonLinesFormatter(with_time))
+        _handlers_by_logger[log_name] = (r_handler, _stdout_handler)
+        logger.addHandler(LoggerQueueHandler(_log_queue, log_name))
+    return logger
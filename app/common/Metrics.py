@@ -0,0 +1,181 @@
+import math
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+# seconds: from the decode of a small body to the solve of a large MILP
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def formatValue(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def formatLabels(label_names: Iterable[str], label_values: Iterable[str]) -> str:
+    pairs = [f'{name}="{escapeLabel(value)}"' for name, value in zip(label_names, label_values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def escapeLabel(value) -> str:
+    return f'{value}'.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Metric:
+    """ Thread-safe metric with labels, rendered in the Prometheus text format """
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = dict()
+        self._lock = threading.Lock()
+
+    def labelValues(self, labels: dict) -> tuple:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f'{self.name} expects the labels {self.label_names}, got {tuple(labels)}')
+        return tuple(f'{labels[name]}' for name in self.label_names)
+
+    def snapshot(self) -> list:
+        # [[label values, value]]: JSON serializable, added up by render in another process
+        with self._lock:
+            return [[list(label_values), self.copyValue(value)] for label_values, value in self._values.items()]
+
+    def render(self, snapshots: Iterable[list] = ()) -> List[str]:
+        # snapshots: of the same metric in other processes
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            values = {label_values: self.copyValue(value) for label_values, value in self._values.items()}
+        for snapshot in snapshots:
+            for label_values, value in snapshot:
+                key = tuple(label_values)
+                values[key] = self.addValues(values[key], value) if key in values else value
+        for label_values, value in sorted(values.items()):
+            lines.extend(self.renderValue(label_values, value))
+        return lines
+
+    def copyValue(self, value):
+        return value
+
+    def addValues(self, value, other):
+        return value + other
+
+    def renderValue(self, label_values: tuple, value) -> List[str]:
+        return [f'{self.name}{formatLabels(self.label_names, label_values)} {formatValue(value)}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.labelValues(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self.labelValues(labels), 0)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.labelValues(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self.labelValues(labels), 0)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self.labelValues(labels)
+        with self._lock:
+            # [count of every bucket (not cumulative), sum]
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [[0] * len(self.buckets), 0.0]
+            for ix, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    counts[0][ix] += 1
+                    break
+            counts[1] += value
+
+    def copyValue(self, value):
+        return [list(value[0]), value[1]]
+
+    def addValues(self, value, other):
+        return [[a + b for a, b in zip(value[0], other[0])], value[1] + other[1]]
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            counts = self._values.get(self.labelValues(labels))
+            return sum(counts[0]) if counts is not None else 0
+
+    def renderValue(self, label_values: tuple, value) -> List[str]:
+        bucket_counts, total = value
+        names = self.label_names + ('le',)
+        lines = list()
+        cumulative = 0
+        for upper_bound, count in zip(self.buckets, bucket_counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{formatLabels(names, label_values + (formatValue(upper_bound),))} '
+                         f'{cumulative}')
+        labels = formatLabels(self.label_names, label_values)
+        lines.append(f'{self.name}_sum{labels} {formatValue(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process, rendered together for the /metrics endpoint. The snapshots of the registries of
+    other processes (e.g. the other web workers) are added up to the values of this one
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = dict()
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Metric {metric.name} already registered')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def snapshot(self) -> Dict[str, list]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render(self, snapshots: Iterable[Dict[str, list]] = ()) -> str:
+        snapshots = list(snapshots)
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(line for metric in metrics
+                         for line in metric.render([s.get(metric.name, []) for s in snapshots])) + '\n'
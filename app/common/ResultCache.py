@@ -0,0 +1,138 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.common.DefaultLogger import configure_logger
+
+log = configure_logger("errors.log")
+
+# wait for a sqlite file locked by another process (seconds): a slower lookup is not worth it, it is a miss
+DB_TIMEOUT_SECONDS = 0.5
+
+
+def canonical_hash(payload: dict, *args) -> str:
+    """
+    sha256 of a calendar payload (CalendarInformationSC.dict()) that does not depend on
+    the order of the aircraft nor on the order of the keys. args are added to the hash (e.g. the engine)
+    """
+    aircraft_data = sorted(json.dumps(p, sort_keys=True, separators=(',', ':'))
+                           for p in payload.get('processedAircraftData', []))
+    other = {k: v for k, v in payload.items() if k != 'processedAircraftData'}
+    canonical = json.dumps([aircraft_data, other, list(args)], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with TTL for serialized results, with an optional sqlite tier
+    that keeps the results between restarts (and can be shared by several processes).
+    An error of the sqlite tier (e.g. the file locked by another process) is logged and the
+    lookup is a miss: the cache never fails the caller. Its calls block: use it out of an event loop
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600, db_file_path: str = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        # the sqlite file is opened on the first use (e.g. not by the processes that import the cache but never
+        # use it). Its calls wait for the other processes: they do not hold the lock of the memory tier
+        self._db_file_path = db_file_path
+        self._db = None
+        self._db_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > now:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._items[key]
+        row = self._get_from_db(key, now)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            self._set_in_memory(key, value, expires_at)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: dict):
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._set_in_memory(key, value, expires_at)
+        self._execute_in_db('INSERT OR REPLACE INTO result_cache VALUES (?, ?, ?)',
+                            (key, json.dumps(value), expires_at))
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            deleted = self._items.pop(key, None) is not None
+        return self._execute_in_db('DELETE FROM result_cache WHERE key = ?', (key,)) > 0 or deleted
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+        self._execute_in_db('DELETE FROM result_cache')
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(size=len(self._items), max_size=self.max_size, ttl_seconds=self.ttl_seconds,
+                        hits=self.hits, misses=self.misses, on_disk=self._db_file_path is not None)
+
+    def _set_in_memory(self, key: str, value: dict, expires_at: float):
+        self._items[key] = (expires_at, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def _connection(self) -> sqlite3.Connection:
+        # called with _db_lock held
+        if self._db is None:
+            db = sqlite3.connect(self._db_file_path, timeout=DB_TIMEOUT_SECONDS, check_same_thread=False)
+            db.execute('CREATE TABLE IF NOT EXISTS result_cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)')
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _execute_in_db(self, statement: str, parameters: tuple = ()) -> int:
+        # number of rows changed, 0 without sqlite tier or when it fails
+        if self._db_file_path is None:
+            return 0
+        try:
+            with self._db_lock:
+                db = self._connection()
+                n_rows = db.execute(statement, parameters).rowcount
+                db.commit()
+                return n_rows
+        except sqlite3.Error as e:
+            log.warning(f"Result cache (sqlite): {e}")
+            return 0
+
+    def _get_from_db(self, key: str, now: float) -> Optional[tuple]:
+        if self._db_file_path is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._connection().execute('SELECT value, expires_at FROM result_cache WHERE key = ?',
+                                       (key,)).fetchone()
+        except sqlite3.Error as e:
+            log.warning(f"Result cache (sqlite): {e}")
+            return None
+        if row is None:
+            return None
+        if row[1] <= now:
+            self._execute_in_db('DELETE FROM result_cache WHERE key = ?', (key,))
+            return None
+        return json.loads(row[0]), row[1]
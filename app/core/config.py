@@ -15,11 +15,15 @@ else:
 load_dotenv(dotenv_path=env_path)
 
 
+def database_file_path(db_file_name):
+    db_file_path = os.path.join(project_path, 'db', db_file_name)
+    # the file name can include folders (e.g. ./db/app in prod.env)
+    os.makedirs(os.path.dirname(db_file_path), exist_ok=True)
+    return db_file_path
+
+
 def sqlite_database_url(db_file_name):
-    db_path = os.path.join(project_path, 'db')
-    if not os.path.exists(db_path):
-        os.makedirs(db_path)
-    db_file_path = os.path.join(db_path, db_file_name)
+    db_file_path = database_file_path(db_file_name)
     if platform.system() == 'Linux' or platform.system() == 'Darwin':
         return f'sqlite:////{db_file_path}'
     elif platform.system() == 'Windows':
@@ -30,6 +34,60 @@ class Settings:
     PROJECT_NAME: str = os.getenv("PROJECT_NAME", "Not defined")
     PROJECT_VERSION: str = os.getenv("PROJECT_VERSION", "0.0.0")
     SQLALCHEMY_DATABASE_URL: str = sqlite_database_url(os.getenv("SQLALCHEMY_DATABASE_FILE_NAME", "app_dev.db"))
+    # Pyomo solver used by the MILP engine (e.g. appsi_highs, glpk). Empty: first available, GLPK as fallback
+    SOLVER_BACKEND: str = os.getenv("SOLVER_BACKEND", "")
+    # Maximum number of ranked alternatives (n_best) of a round trip request
+    MAX_N_BEST: int = int(os.getenv("MAX_N_BEST", 1000))
+    # Default engine for the round trip problems (milp, direct or decomposed)
+    ROUND_TRIP_ENGINE: str = os.getenv("ROUND_TRIP_ENGINE", "milp")
+    # Cache of /opt/round-trip results (size 0 disables it). Empty file name: only in memory
+    RESULT_CACHE_SIZE: int = int(os.getenv("RESULT_CACHE_SIZE", 1024))
+    RESULT_CACHE_TTL_SECONDS: float = float(os.getenv("RESULT_CACHE_TTL_SECONDS", 3600))
+    RESULT_CACHE_DB_FILE_NAME: str = os.getenv("RESULT_CACHE_DB_FILE_NAME", "")
+    # Number of solver worker processes (0: one per CPU, negative: solve in threads of the web server)
+    SOLVER_POOL_SIZE: int = int(os.getenv("SOLVER_POOL_SIZE", 0))
+    # Tasks allowed to wait for a free worker before answering 503 (back-pressure)
+    SOLVER_POOL_MAX_QUEUE: int = int(os.getenv("SOLVER_POOL_MAX_QUEUE", 32))
+    # Maximum time to wait for a solution (0: no limit). The worker processes of a timed out task are replaced
+    SOLVER_TASK_TIMEOUT_SECONDS: float = float(os.getenv("SOLVER_TASK_TIMEOUT_SECONDS", 60))
+    # Asynchronous round trip jobs (/opt/round-trip/jobs): only mounted with jobs in ROUTERS, they are not by default.
+    # Jobs run at the same time by each web worker (one process per job)
+    JOB_POOL_SIZE: int = int(os.getenv("JOB_POOL_SIZE", 1))
+    # Period of the checks of the jobs: new queued jobs, cancellations and the heartbeat of the running ones.
+    # A running job without heartbeat for JOB_HEARTBEAT_TIMEOUT_SECONDS was left by a stopped server: it fails
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", 1))
+    JOB_HEARTBEAT_TIMEOUT_SECONDS: float = float(os.getenv("JOB_HEARTBEAT_TIMEOUT_SECONDS", 30))
+    # Jobs with at most this number of (departure, return) pairs are solved synchronously
+    JOB_SYNC_MAX_PAIRS: int = int(os.getenv("JOB_SYNC_MAX_PAIRS", 10000))
+    # Model templates (by problem shape) reused by the MILP engine in each worker process (0: new model per problem)
+    MODEL_TEMPLATE_CACHE_SIZE: int = int(os.getenv("MODEL_TEMPLATE_CACHE_SIZE", 4))
+    # Round trip sessions kept in memory (least recently used are dropped) and their lifetime since the last change
+    SESSION_MAX_COUNT: int = int(os.getenv("SESSION_MAX_COUNT", 64))
+    SESSION_TTL_SECONDS: float = float(os.getenv("SESSION_TTL_SECONDS", 1800))
+    # Token of the admin requests (X-Admin-Token header), e.g. the profiling of a request. Empty: no admins
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    # Validate the optimization answers against their response_model before sending them (slower)
+    VALIDATE_RESPONSES: bool = os.getenv("VALIDATE_RESPONSES", "false").lower() in ("1", "true", "yes")
+    # Routers mounted by the API (comma separated): opt, jobs, sessions, metrics, profiles, users, roles.
+    # The database is only set up when a mounted router uses it (jobs, users, roles): none of the default ones
+    ROUTERS: list = [r.strip() for r in os.getenv("ROUTERS", "opt,sessions,metrics,profiles").split(",")
+                     if r.strip()]
+    # Load the modeling libraries and the solver in every worker of the solver pool at startup
+    PREWARM: bool = os.getenv("PREWARM", "false").lower() in ("1", "true", "yes")
+    # Web server processes started by app_prod.py (0: one per CPU, a single one with the sessions router). The CPUs
+    # are shared between their solver pools
+    WEB_WORKERS: int = int(os.getenv("WEB_WORKERS", 0))
+    # Requests served by a web worker before it is replaced by a new (warmed up) one, 0: never replaced.
+    # Each worker adds a random number of requests up to the jitter: the workers are not replaced all at once
+    WEB_WORKER_MAX_REQUESTS: int = int(os.getenv("WEB_WORKER_MAX_REQUESTS", 0))
+    WEB_WORKER_MAX_REQUESTS_JITTER: int = int(os.getenv("WEB_WORKER_MAX_REQUESTS_JITTER",
+                                                        WEB_WORKER_MAX_REQUESTS // 10))
+    # Time given to the requests in progress of a stopping web worker
+    WEB_GRACEFUL_SHUTDOWN_SECONDS: int = int(os.getenv("WEB_GRACEFUL_SHUTDOWN_SECONDS", 60))
+    # Directory where each web worker writes its metrics every METRICS_SYNC_SECONDS, /metrics adds them up.
+    # Empty: /metrics reports the worker that answers. app_prod.py uses a new one with several workers
+    METRICS_DIR: str = os.getenv("METRICS_DIR", "")
+    METRICS_SYNC_SECONDS: float = float(os.getenv("METRICS_SYNC_SECONDS", 1))
 
 
 settings = Settings()
@@ -5,6 +5,7 @@ from starlette.responses import JSONResponse
 import traceback
 
 from app.common.DefaultLogger import configure_logger
+from app.core.solver_pool import SolverPoolSaturatedError, SolverTaskTimeoutError
 
 log = configure_logger("errors.log")
 
@@ -12,6 +13,18 @@ INVALID_DATA_REQUEST_MSG = 'Invalid data request'
 
 
 def define_handler_exception(app: FastAPI):
+    # The solver pool is full: the client should retry later
+    @app.exception_handler(SolverPoolSaturatedError)
+    async def solver_pool_saturated_handler_exception(request: Request, exc):
+        log.warning(f"{request.method} {request.url}: {exc}")
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content=dict(error=f"{exc}"), headers={"Retry-After": "1"})
+
+    @app.exception_handler(SolverTaskTimeoutError)
+    async def solver_task_timeout_handler_exception(request: Request, exc):
+        log.warning(f"{request.method} {request.url}: {exc}")
+        return JSONResponse(status_code=status.HTTP_504_GATEWAY_TIMEOUT, content=dict(error=f"{exc}"))
+
     # This dispatch all general Exceptions
     @app.exception_handler(Exception)
     async def default_handler_exception(request: Request, exc):
@@ -1,21 +1,42 @@
+import time
+import uuid
+
 from fastapi import FastAPI
 from starlette import status
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 import traceback
 
-from app.common.DefaultLogger import configure_logger
+from app.common.DefaultLogger import configure_logger, request_id_var
+from app.core.metrics import REQUEST_SECONDS
 
 log = configure_logger("app_activity.log")
 
+REQUEST_ID_HEADER = 'X-Request-Id'
+
 
 def log_after_request(app: FastAPI):
     # This logs any activity of the app
     @app.middleware("http")
     async def log_activity_for_this_call(request: Request, call_next):
-        response = await call_next(request)
-        log.info(f"{request.client.host}: {request.method} {request.url} [{response.status_code}]")
-        return response
+        # the id of the caller (e.g. a proxy) is kept, it is added to every record logged for this request
+        request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        try:
+            start = time.perf_counter()
+            response = await call_next(request)
+            elapsed = time.perf_counter() - start
+            # the path of the route (not the URL) keeps the ids out of the labels
+            route = request.scope.get('route')
+            REQUEST_SECONDS.observe(elapsed, method=request.method,
+                                    path=route.path if route is not None else 'unmatched', status=response.status_code)
+            response.headers[REQUEST_ID_HEADER] = request_id
+            log.info(f"{request.client.host}: {request.method} {request.url} [{response.status_code}] {elapsed:.4f} s",
+                     extra=dict(client=request.client.host, method=request.method, url=f'{request.url}',
+                                status=response.status_code, duration_ms=round(elapsed * 1000, 3)))
+            return response
+        finally:
+            request_id_var.reset(token)
 
 
 
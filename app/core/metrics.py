@@ -0,0 +1,122 @@
+"""
+Metrics of the web process, exposed in the Prometheus text format on /metrics. The stages that run in the solver
+pool are measured by the workers and recorded here with the answers (see record_solver_stats).
+With METRICS_DIR every web worker writes the snapshot of its metrics there (the replaced workers too): /metrics
+adds them up
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+
+from starlette.concurrency import run_in_threadpool
+
+from app.common.Metrics import MetricsRegistry
+from app.core.config import settings
+
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram('http_request_duration_seconds', 'Latency of the HTTP requests',
+                                     ('method', 'path', 'status'))
+STAGE_SECONDS = registry.histogram('optimization_stage_seconds',
+                                   'Time of each stage of the optimization requests (decode, validation, conversion, '
+                                   'build, solve, extraction, serialization)', ('stage',))
+SOLVES = registry.counter('optimization_solves_total', 'Problems solved by engine and solver backend',
+                          ('engine', 'backend'))
+MODEL_VARIABLES = registry.counter('optimization_model_variables_total', 'Decision variables of the solved models')
+MODEL_CONSTRAINTS = registry.counter('optimization_model_constraints_total', 'Constraints of the solved models')
+FEASIBLE_PAIRS = registry.counter('optimization_feasible_pairs_total',
+                                  'Feasible (departure, return) pairs of the solved problems')
+CACHE_REQUESTS = registry.counter('round_trip_cache_requests_total', 'Lookups of the round trip result cache',
+                                  ('result',))
+SOLVER_TASK_TIMEOUTS = registry.counter('solver_task_timeouts_total',
+                                        'Solver pool tasks that timed out (their answer is discarded)')
+SOLVER_TIMED_OUT_RUNNING = registry.gauge('solver_timed_out_tasks_running',
+                                          'Timed out solver pool tasks still holding a worker')
+SOLVER_POOLS_RECYCLED = registry.counter('solver_pools_recycled_total',
+                                         'Solver process pools replaced, and their workers terminated, after a timeout')
+
+
+@contextmanager
+def timed_stage(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_solver_stats(engine: str, stats: dict):
+    # stats: filled by the modeling layer (modeling.models.utils.timeStage and addCount)
+    for stage, seconds in stats.get('stages', dict()).items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    SOLVES.inc(engine=engine, backend=stats.get('backend', engine))
+    MODEL_VARIABLES.inc(stats.get('variables', 0))
+    MODEL_CONSTRAINTS.inc(stats.get('constraints', 0))
+    FEASIBLE_PAIRS.inc(stats.get('feasible_pairs', 0))
+
+
+@lru_cache(maxsize=None)
+def snapshot_path() -> str:
+    # the process id can be reused by a later worker: its snapshot would replace the one of the stopped worker
+    return os.path.join(settings.METRICS_DIR, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+
+
+def write_snapshot():
+    path = snapshot_path()
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(registry.snapshot(), f)
+    # the other workers never read a partial snapshot
+    os.replace(f'{path}.tmp', path)
+
+
+def read_snapshots() -> list:
+    # the snapshots of the other workers
+    own_file = os.path.basename(snapshot_path())
+    snapshots = list()
+    for file_name in os.listdir(settings.METRICS_DIR):
+        if not file_name.endswith('.json') or file_name == own_file:
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, file_name)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def render_metrics() -> str:
+    if not settings.METRICS_DIR:
+        return registry.render()
+    write_snapshot()
+    return registry.render(read_snapshots())
+
+
+_snapshot_writer = None
+
+
+async def write_snapshots():
+    while True:
+        await asyncio.sleep(settings.METRICS_SYNC_SECONDS)
+        await run_in_threadpool(write_snapshot)
+
+
+def start_snapshot_writer():
+    global _snapshot_writer
+    if settings.METRICS_DIR:
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        _snapshot_writer = asyncio.create_task(write_snapshots())
+
+
+async def stop_snapshot_writer():
+    global _snapshot_writer
+    if _snapshot_writer is None:
+        return
+    _snapshot_writer.cancel()
+    await asyncio.gather(_snapshot_writer, return_exceptions=True)
+    _snapshot_writer = None
+    # the last requests of a stopping worker are counted too
+    await run_in_threadpool(write_snapshot)
@@ -0,0 +1,48 @@
+"""
+Route class that decodes the JSON request bodies with orjson, and orjson responses
+"""
+import json
+from typing import Any, Callable, Dict
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+from app.core.metrics import timed_stage
+
+
+class ORJSONRequest(Request):
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            body = await self.body()
+            with timed_stage('decode'):
+                try:
+                    self._json = orjson.loads(body)
+                except orjson.JSONDecodeError:
+                    # the standard decoder accepts a few more documents (NaN, Infinity) and the usual error messages
+                    self._json = json.loads(body)
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+
+        async def orjson_route_handler(request: Request) -> Response:
+            return await route_handler(ORJSONRequest(request.scope, request.receive))
+
+        return orjson_route_handler
+
+
+def orjson_response(content: Any, status_code: int = 200, headers: Dict[str, str] = None) -> Any:
+    """
+    content serialized straight to an ORJSONResponse: FastAPI does not validate it against the response_model
+    of the route. With VALIDATE_RESPONSES the content is returned as is to be validated (status_code should be
+    the one of the route and the headers set in the Response parameter of the route then)
+    """
+    if settings.VALIDATE_RESPONSES:
+        return content
+    with timed_stage('serialization'):
+        return ORJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,62 @@
+"""
+Opt-in profiling of single optimization requests, restricted to admins: the solve runs under cProfile in the
+solver pool and its stats are saved (pstats format) under log/profiles, referenced by the X-Profile-Id header
+"""
+import cProfile
+import datetime as dt
+import hmac
+import os
+import re
+import uuid
+from typing import Any, Optional, Tuple
+
+from fastapi import Header, HTTPException, Query
+from starlette import status
+
+from app.common.DefaultLogger import log_path
+from app.core.config import settings
+
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILING_FORBIDDEN_MSG = 'Profiling is restricted to admins.'
+
+profiles_path = os.path.join(log_path, 'profiles')
+
+_profile_id_pattern = re.compile(r'^\d{8}_\d{6}_[0-9a-f]{8}$')
+
+
+def profile_file_path(profile_id: str) -> Optional[str]:
+    # None for anything that is not a profile id (the ids are part of file paths)
+    if not _profile_id_pattern.match(profile_id):
+        return None
+    return os.path.join(profiles_path, f'{profile_id}.pstats')
+
+
+def run_profiled(fn, *args) -> Tuple[Any, str]:
+    # fn(*args) under cProfile: returns its result and the id of the saved profile (it runs in the solver pool)
+    profile_id = f"{dt.datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}"
+    profiler = cProfile.Profile()
+    try:
+        result = profiler.runcall(fn, *args)
+    finally:
+        os.makedirs(profiles_path, exist_ok=True)
+        profiler.dump_stats(profile_file_path(profile_id))
+    return result, profile_id
+
+
+def is_admin(token: Optional[str]) -> bool:
+    # without ADMIN_TOKEN there are no admins
+    return bool(settings.ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, settings.ADMIN_TOKEN)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=PROFILING_FORBIDDEN_MSG)
+
+
+def profiling_requested(profile: bool = Query(False, description='Profile the solve (admins only)'),
+                        x_profile: bool = Header(False), x_admin_token: Optional[str] = Header(None)) -> bool:
+    # the flag can be sent as query parameter or header, nothing else is done when it is not
+    if not (profile or x_profile):
+        return False
+    require_admin(x_admin_token)
+    return True
@@ -0,0 +1,216 @@
+"""
+Process pool used to run the CPU bound solver work out of the event loop and across all the cores
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+from app.common.DefaultLogger import configure_logger
+from app.core.config import settings
+from app.core.metrics import SOLVER_TASK_TIMEOUTS, SOLVER_TIMED_OUT_RUNNING, SOLVER_POOLS_RECYCLED
+
+SOLVER_POOL_SATURATED_MSG = 'The optimization service is saturated, try again later'
+SOLVER_TASK_TIMEOUT_MSG = 'The optimization problem took too long to be solved'
+
+_solver_pool = None
+_solver_threads = None
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+# tasks sent to the workers (at most one per worker): the other admitted tasks wait in the event loop
+_running_slots = None
+# running tasks of each process pool, and the pools replaced after a timeout that are not terminated yet
+_pool_tasks = dict()
+_retired_pools = dict()
+
+
+class SolverPoolSaturatedError(Exception):
+    pass
+
+
+class SolverTaskTimeoutError(Exception):
+    pass
+
+
+def solver_pool_size() -> int:
+    return settings.SOLVER_POOL_SIZE if settings.SOLVER_POOL_SIZE > 0 else os.cpu_count() or 1
+
+
+def warm_up_worker():
+    # the modeling libraries are imported lazily: with PREWARM each worker loads them before its first task.
+    # A failed warm up only delays that cost to the first request (an exception would break the pool)
+    from app.services.GLPKServices import warm_up
+    try:
+        warm_up()
+    except Exception as exc:
+        configure_logger("errors.log").warning(f"Warm up of the solver worker {os.getpid()} failed: {exc}")
+
+
+def get_solver_pool() -> ProcessPoolExecutor:
+    global _solver_pool
+    if _solver_pool is None:
+        # spawn: workers do not inherit the threads (and locks) of the web server
+        _solver_pool = ProcessPoolExecutor(max_workers=solver_pool_size(),
+                                           mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=warm_up_worker if settings.PREWARM else None)
+    return _solver_pool
+
+
+def get_solver_threads() -> ThreadPoolExecutor:
+    # SOLVER_POOL_SIZE < 0: the tasks run in threads of this process
+    global _solver_threads
+    if _solver_threads is None:
+        _solver_threads = ThreadPoolExecutor(max_workers=solver_pool_size(), thread_name_prefix='solver')
+    return _solver_threads
+
+
+def get_running_slots() -> asyncio.Semaphore:
+    global _running_slots
+    if _running_slots is None:
+        _running_slots = asyncio.Semaphore(solver_pool_size())
+    return _running_slots
+
+
+async def prewarm_solver_pool():
+    """ Starts the workers of the solver pool (warmed up by warm_up_worker) before the first request """
+    if settings.SOLVER_POOL_SIZE < 0:
+        await asyncio.wrap_future(get_solver_threads().submit(warm_up_worker))
+        return
+    pool = get_solver_pool()
+    # a worker is started per task submitted while the others are busy starting
+    await asyncio.gather(*(asyncio.wrap_future(pool.submit(os.getpid)) for _ in range(solver_pool_size())))
+
+
+def terminate_pool(pool: ProcessPoolExecutor):
+    # ProcessPoolExecutor cannot stop a busy worker (before Python 3.14): its processes are terminated, and its
+    # remaining tasks fail with BrokenProcessPool
+    for process in list(pool._processes.values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+    _pool_tasks.pop(pool, None)
+
+
+async def retire_solver_pool(pool: ProcessPoolExecutor):
+    """
+    A timed out task keeps its worker busy: its pool is replaced by a new one for the next tasks, and it is
+    terminated once its other running tasks finish (or time out too)
+    """
+    global _solver_pool
+    if _solver_pool is pool:
+        _solver_pool = None
+    running = list(_pool_tasks.get(pool, ()))
+    if running:
+        await asyncio.get_running_loop().run_in_executor(None, wait, running,
+                                                         settings.SOLVER_TASK_TIMEOUT_SECONDS or None)
+    terminate_pool(pool)
+    SOLVER_POOLS_RECYCLED.inc()
+
+
+def abandon_task(future: Future, pool: ProcessPoolExecutor = None):
+    # the worker of a timed out task is busy (and its running slot taken) until the task finishes or its pool is
+    # terminated. A thread (SOLVER_POOL_SIZE < 0) cannot be stopped: it is only counted until it finishes
+    SOLVER_TASK_TIMEOUTS.inc()
+    SOLVER_TIMED_OUT_RUNNING.inc()
+    future.add_done_callback(lambda _: SOLVER_TIMED_OUT_RUNNING.dec())
+    if pool is not None and pool not in _retired_pools:
+        _retired_pools[pool] = asyncio.create_task(retire_solver_pool(pool))
+        _retired_pools[pool].add_done_callback(lambda _: _retired_pools.pop(pool, None))
+
+
+def shutdown_solver_pool():
+    global _solver_pool, _solver_threads, _running_slots
+    if _solver_pool is not None:
+        _solver_pool.shutdown(wait=False, cancel_futures=True)
+        _pool_tasks.pop(_solver_pool, None)
+        _solver_pool = None
+    for pool, retirement in list(_retired_pools.items()):
+        retirement.cancel()
+        terminate_pool(pool)
+    if _solver_threads is not None:
+        _solver_threads.shutdown(wait=False, cancel_futures=True)
+        _solver_threads = None
+    _running_slots = None
+
+
+def admit(n_tasks: int = 1):
+    """
+    Counts n_tasks as in flight, or raises SolverPoolSaturatedError when they do not fit in the workers plus
+    SOLVER_POOL_MAX_QUEUE waiting tasks (back-pressure). The tasks of a group are admitted (or rejected) together
+    """
+    global _in_flight
+    capacity = solver_pool_size() + settings.SOLVER_POOL_MAX_QUEUE
+    with _in_flight_lock:
+        if _in_flight + n_tasks > capacity:
+            raise SolverPoolSaturatedError(SOLVER_POOL_SATURATED_MSG)
+        _in_flight += n_tasks
+
+
+def release(n_tasks: int = 1):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= n_tasks
+
+
+@contextmanager
+def admitted_group(n_tasks: int):
+    """ Admits a group of n_tasks (e.g. a batch) at once: its tasks are run with run_in_solver_pool(admitted=True) """
+    admit(n_tasks)
+    try:
+        yield
+    finally:
+        release(n_tasks)
+
+
+def submit_to_solver_pool(fn, *args) -> Tuple[Future, Optional[ProcessPoolExecutor]]:
+    """ Submits fn(*args) to the solver pool (or to its threads with SOLVER_POOL_SIZE < 0). Returns the pool too """
+    if settings.SOLVER_POOL_SIZE < 0:
+        return get_solver_threads().submit(fn, *args), None
+    pool = get_solver_pool()
+    future = pool.submit(fn, *args)
+    tasks = _pool_tasks.setdefault(pool, set())
+    tasks.add(future)
+    # the callbacks run in a thread of the pool: the set is only changed in the event loop
+    loop = asyncio.get_running_loop()
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(tasks.discard, future))
+    return future, pool
+
+
+async def run_in_solver_pool(fn, *args, admitted: bool = False):
+    """
+    Awaits fn(*args) in the solver pool. Raises SolverPoolSaturatedError when the task is not admitted (admit),
+    unless it belongs to an admitted_group. The admitted tasks wait in the event loop for a free worker, and the
+    SOLVER_TASK_TIMEOUT_SECONDS timeout (SolverTaskTimeoutError) starts when the task is sent to a worker:
+    its result is discarded and its worker recycled (abandon_task)
+    """
+    timeout = settings.SOLVER_TASK_TIMEOUT_SECONDS or None
+    if not admitted:
+        admit()
+    pool = None
+    try:
+        running_slots = get_running_slots()
+        await running_slots.acquire()
+        try:
+            future, pool = submit_to_solver_pool(fn, *args)
+        except BaseException:
+            running_slots.release()
+            raise
+        # the worker is busy until the task finishes, even when its result is not awaited anymore
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(running_slots.release))
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+    except asyncio.TimeoutError:
+        abandon_task(future, pool)
+        raise SolverTaskTimeoutError(SOLVER_TASK_TIMEOUT_MSG)
+    except BrokenProcessPool:
+        # a worker died: this pool cannot be used anymore, the next task will create a new one (a retired pool
+        # is already replaced)
+        if pool is None or pool is _solver_pool:
+            shutdown_solver_pool()
+        raise
+    finally:
+        if not admitted:
+            release()
@@ -4,4 +4,5 @@ Important: import the classes that will generate new tables in this file
 from app.db.base_class import DBBaseClass
 from app.db.models.User import User
 from app.db.models.Role import Role
+from app.db.models.Job import Job
 
@@ -0,0 +1,50 @@
+import datetime as dt
+import json
+import uuid
+
+from sqlalchemy import Column, DateTime, Integer, String, Text
+
+from app.db.base_class import DBBaseClass
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class Job(DBBaseClass):
+    __tablename__ = 'job'
+    # Fields:
+    id = Column(Integer, primary_key=True, index=True)
+    public_id = Column(String, unique=True, index=True, default=None)
+    status = Column(String, index=True, default=QUEUED)
+    engine = Column(String)
+    # request and result are stored as JSON
+    request = Column(Text)
+    result = Column(Text, default=None)
+    error = Column(String, default=None)
+    created_at = Column(DateTime, default=dt.datetime.utcnow)
+    updated_at = Column(DateTime, default=dt.datetime.utcnow, onupdate=dt.datetime.utcnow)
+
+    def __init__(self, request: dict, *args, **values):
+        super().__init__(*args, **values)
+        if self.public_id is None:
+            self.public_id = str(uuid.uuid4())
+        if self.status is None:
+            self.status = QUEUED
+        self.request = json.dumps(request)
+
+    def __str__(self):
+        return f"{self.public_id} ({self.engine}): {self.status}"
+
+    def to_dict(self):
+        return dict(
+            public_id=self.public_id,
+            status=self.status,
+            engine=self.engine,
+            result=json.loads(self.result) if self.result is not None else None,
+            error=self.error,
+            created_at=self.created_at,
+            updated_at=self.updated_at
+        )
@@ -1,18 +1,48 @@
-from fastapi import APIRouter
+from typing import List
+
+from fastapi import APIRouter, Body, Depends, Response
+from fastapi.responses import ORJSONResponse
+from app.core.config import settings
+from app.core.orjson_route import ORJSONRoute, orjson_response
+from app.core.profiling import PROFILE_ID_HEADER, profiling_requested
 from app.schemas import GLPKSchema
-from app.services.GLPKServices import run_round_trip_model_service
-from modeling.classes.ProcessedAircraftData import ProcessedAircraftData
+from app.services.GLPKServices import cached_round_trip_payload_service, batch_round_trip_model_service, \
+    profiled_round_trip_payload_service, round_trip_cache
+
+default_engine = GLPKSchema.RoundTripEngineSC(settings.ROUND_TRIP_ENGINE)
 
 router = APIRouter(
     prefix="/opt",
     tags=["opt"],
     responses={404: {"description": "Not found"}},
+    route_class=ORJSONRoute,
+    default_response_class=ORJSONResponse,
 )
 
 
-@router.post('/round-trip', response_model=GLPKSchema.MinCostRoundTripAnswerSC)
-def solve_round_trip_optimization_problem(data: GLPKSchema.CalendarInformationSC):
-    valid_processed_aircraft_data = [ProcessedAircraftData(**p.dict()) for p in data.processedAircraftData]
-    response = run_round_trip_model_service(valid_processed_aircraft_data)
-    return response.to_dict()
+@router.post('/round-trip', response_model=List[GLPKSchema.MinCostRoundTripAnswerSC])
+async def solve_round_trip_optimization_problem(
+        response: Response,
+        data: GLPKSchema.CalendarPayloadSC = Body(...),
+        engine: GLPKSchema.RoundTripEngineSC = default_engine,
+        profile: bool = Depends(profiling_requested)):
+    # ranked alternatives: the cheapest first
+    if profile:
+        answers, profile_id = await profiled_round_trip_payload_service(data, engine=engine.value)
+        # with VALIDATE_RESPONSES orjson_response drops its headers: only the Response parameter sets them then
+        response.headers[PROFILE_ID_HEADER] = profile_id
+        return orjson_response(answers, headers={PROFILE_ID_HEADER: profile_id})
+    return orjson_response(await cached_round_trip_payload_service(data, engine=engine.value))
+
+
+@router.post('/round-trip/batch', response_model=List[GLPKSchema.BatchItemAnswerSC])
+async def solve_round_trip_optimization_problems(
+        data: List[GLPKSchema.CalendarInformationSC],
+        engine: GLPKSchema.RoundTripEngineSC = default_engine):
+    # answers are returned in the same order as the problems
+    return orjson_response(await batch_round_trip_model_service(data, engine=engine.value))
+
 
+@router.get('/round-trip/cache')
+def get_round_trip_cache_stats():
+    return round_trip_cache.stats()
@@ -0,0 +1,43 @@
+from sqlalchemy.orm import Session
+from fastapi import Depends, HTTPException, APIRouter
+from starlette import status
+
+from app.core.orjson_route import ORJSONRoute
+from app.db.session import local_db
+from app.endpoints.GLPKEndpoint import default_engine
+from app.schemas import GLPKSchema, JobSchema
+from app.services import JobService
+
+router = APIRouter(
+    prefix="/opt/round-trip/jobs",
+    tags=["opt"],
+    responses={404: {"description": "Not found"}},
+    route_class=ORJSONRoute,
+)
+# the queued jobs are run (and cancelled) by the dispatcher of each web worker
+router.add_event_handler("startup", JobService.start_job_dispatcher)
+router.add_event_handler("shutdown", JobService.stop_job_dispatcher)
+
+
+@router.post('', response_model=JobSchema.Public, status_code=status.HTTP_202_ACCEPTED)
+async def create_round_trip_job(data: GLPKSchema.CalendarInformationSC,
+                                engine: GLPKSchema.RoundTripEngineSC = default_engine,
+                                db: Session = Depends(local_db)):
+    db_job = await JobService.submit(db, data, engine.value)
+    return db_job.to_dict()
+
+
+@router.get('/{public_id}', response_model=JobSchema.Public)
+def get_round_trip_job(public_id: str, db: Session = Depends(local_db)):
+    db_job = JobService.get_by_public_id(db, public_id=public_id)
+    if not db_job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return db_job.to_dict()
+
+
+@router.delete('/{public_id}', response_model=JobSchema.Public)
+def cancel_round_trip_job(public_id: str, db: Session = Depends(local_db)):
+    db_job = JobService.get_by_public_id(db, public_id=public_id)
+    if not db_job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return JobService.cancel(db, db_job).to_dict()
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import render_metrics, start_snapshot_writer, stop_snapshot_writer
+
+# PlainTextResponse adds the charset
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+router = APIRouter(
+    tags=["metrics"],
+)
+# with METRICS_DIR each web worker shares its metrics with the others
+router.add_event_handler("startup", start_snapshot_writer)
+router.add_event_handler("shutdown", stop_snapshot_writer)
+
+
+@router.get('/metrics', response_class=PlainTextResponse)
+def get_metrics():
+    # metrics of this process (of all the web workers with METRICS_DIR) in the Prometheus text format
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
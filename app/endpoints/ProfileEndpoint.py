@@ -0,0 +1,22 @@
+import os
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from app.core.profiling import profile_file_path, require_admin
+
+router = APIRouter(
+    prefix="/opt/profiles",
+    tags=["admin"],
+    responses={404: {"description": "Not found"}},
+    dependencies=[Depends(require_admin)],
+)
+
+
+@router.get('/{profile_id}', response_class=FileResponse)
+def get_profile(profile_id: str):
+    # pstats file of a profiled request (X-Profile-Id header), e.g. python -m pstats <file> or snakeviz <file>
+    file_path = profile_file_path(profile_id)
+    if file_path is None or not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return FileResponse(file_path, media_type='application/octet-stream', filename=f'{profile_id}.pstats')
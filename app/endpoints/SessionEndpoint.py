@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Body, HTTPException
+from fastapi.responses import ORJSONResponse
+from starlette import status
+
+from app.core.orjson_route import ORJSONRoute, orjson_response
+from app.schemas import GLPKSchema, SessionSchema
+from app.services import SessionService
+
+router = APIRouter(
+    prefix="/opt/round-trip/sessions",
+    tags=["opt"],
+    responses={404: {"description": "Not found"}},
+    route_class=ORJSONRoute,
+    default_response_class=ORJSONResponse,
+)
+
+
+@router.post('', response_model=SessionSchema.Public, status_code=status.HTTP_201_CREATED)
+async def create_round_trip_session(data: GLPKSchema.CalendarPayloadSC = Body(...)):
+    # the answers of the session are the same as the direct engine ones
+    return orjson_response(await SessionService.create(data), status_code=status.HTTP_201_CREATED)
+
+
+@router.get('/{session_id}', response_model=SessionSchema.Public)
+async def get_round_trip_session(session_id: str):
+    response = await SessionService.get(session_id)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Session not found.")
+    return orjson_response(response)
+
+
+@router.patch('/{session_id}/aircraft/{aircraft_code}', response_model=SessionSchema.Public)
+async def update_round_trip_session_aircraft(session_id: str, aircraft_code: str,
+                                             data: GLPKSchema.ProcessedAircraftDataSC):
+    # replaces (or adds) the calendar of one aircraft and returns the updated answers
+    if data.processedAircraft.aircraftCode not in (None, aircraft_code):
+        raise HTTPException(status_code=422, detail="The aircraftCode of the body does not match the URL.")
+    aircraft_data = data.dict()
+    aircraft_data['processedAircraft']['aircraftCode'] = aircraft_code
+    response = await SessionService.update_aircraft(session_id, aircraft_data)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Session not found.")
+    return orjson_response(response)
+
+
+@router.delete('/{session_id}', status_code=status.HTTP_204_NO_CONTENT)
+def delete_round_trip_session(session_id: str):
+    if not SessionService.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found.")
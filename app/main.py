@@ -1,4 +1,5 @@
-import uvicorn
+import importlib
+
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
@@ -6,26 +7,44 @@ from starlette.middleware.cors import CORSMiddleware
 from app.core.log_after_request import log_after_request
 from app.core.config import settings
 from app.core.exception_handler import define_handler_exception
+from app.core.solver_pool import prewarm_solver_pool, shutdown_solver_pool
 
-# import endpoints
-from app.endpoints import UserEndpoint, RoleEndpoint, GLPKEndpoint
-
-# import database models:
-from app.db.session import engine
-from app.db.base import DBBaseClass
+# routers that can be mounted (ROUTERS setting): name -> (module of the endpoint, uses the database).
+# Only the mounted ones are imported, and the database is only set up when one of them uses it
+ROUTERS = {
+    "opt": ("app.endpoints.GLPKEndpoint", False),
+    "jobs": ("app.endpoints.JobEndpoint", True),
+    "sessions": ("app.endpoints.SessionEndpoint", False),
+    "metrics": ("app.endpoints.MetricsEndpoint", False),
+    "profiles": ("app.endpoints.ProfileEndpoint", False),
+    "users": ("app.endpoints.UserEndpoint", True),
+    "roles": ("app.endpoints.RoleEndpoint", True),
+}
 
 
-def include_routes(app):
-    # To include EndPoints:
-    # app.include_router(UserEndpoint.router)
-    # app.include_router(RoleEndpoint.router)
-    app.include_router(GLPKEndpoint.router)
+def include_routes(app) -> bool:
+    # To include EndPoints: add their name to ROUTERS. Returns if the database is needed
+    uses_database = False
+    for name in settings.ROUTERS:
+        if name not in ROUTERS:
+            raise ValueError(f"Unknown router '{name}', expected one of {list(ROUTERS)}")
+        module_name, router_uses_database = ROUTERS[name]
+        app.include_router(importlib.import_module(module_name).router)
+        uses_database = uses_database or router_uses_database
+    return uses_database
 
 
 def create_tables():
     # generate automatically tables in database
     # the corresponding tables must be imported in app.db.base.py
-    DBBaseClass.metadata.create_all(bind=engine)
+    from sqlalchemy.exc import OperationalError
+    from app.db.session import engine
+    from app.db.base import DBBaseClass
+    try:
+        DBBaseClass.metadata.create_all(bind=engine)
+    except OperationalError:
+        # web workers started at the same time race to create them: the tables of the other one are kept
+        DBBaseClass.metadata.create_all(bind=engine)
 
 
 def define_loggers(app):
@@ -47,8 +66,12 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
     define_loggers(app)
-    include_routes(app)
-    create_tables()
+    if include_routes(app):
+        # before the startup handlers of the routers (e.g. the job dispatcher)
+        app.router.on_startup.insert(0, create_tables)
+    if settings.PREWARM:
+        app.add_event_handler("startup", prewarm_solver_pool)
+    app.add_event_handler("shutdown", shutdown_solver_pool)
     return app
 
 
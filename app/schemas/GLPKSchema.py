@@ -1,13 +1,24 @@
-from typing import List
+import math
+from enum import Enum
+from typing import List, Optional
 
 from pydantic import BaseModel, validator
 
+from app.core.config import settings
+from app.core.metrics import timed_stage
+
 
 class ORMBaselModel(BaseModel):
     class Config:
         orm_mode = True
 
 
+class RoundTripEngineSC(str, Enum):
+    milp = 'milp'
+    direct = 'direct'
+    decomposed = 'decomposed'
+
+
 class AircraftSC(ORMBaselModel):
     aircraftCode: str = None
     seats: int = 0
@@ -49,6 +60,105 @@ class ProcessedAircraftDataSC(ORMBaselModel):
 
 class CalendarInformationSC(ORMBaselModel):
     processedAircraftData: List[ProcessedAircraftDataSC]
+    # number of ranked alternatives to return (the memory of the answers and sessions grows with it)
+    n_best: int = 1
+
+    @validator('n_best')
+    def n_best_must_be_in_range(cls, n_best, **kwargs):
+        if 0 < n_best <= settings.MAX_N_BEST:
+            return n_best
+        raise ValueError(f'n_best should be greater than zero and at most {settings.MAX_N_BEST}')
+
+
+def _fast_str(value):
+    if type(value) is str:
+        return value
+    raise TypeError
+
+
+def _fast_int(value):
+    # same coercion as pydantic for the common JSON values: ints, and floats truncated
+    if type(value) is int:
+        return value
+    if type(value) is float and math.isfinite(value):
+        return int(value)
+    raise TypeError
+
+
+def _fast_float(value):
+    if type(value) is float:
+        return value
+    if type(value) is int:
+        return float(value)
+    raise TypeError
+
+
+def _fast_dict(value):
+    if type(value) is dict:
+        return value
+    raise TypeError
+
+
+def _fast_flight(flight: dict) -> dict:
+    flight = _fast_dict(flight)
+    time_in_min = _fast_int(flight['timeInMin'])
+    if time_in_min < 0:
+        raise ValueError
+    return dict(fromAirport=_fast_str(flight['fromAirport']), toAirport=_fast_str(flight['toAirport']),
+                price=_fast_float(flight['price']), timeInMin=time_in_min)
+
+
+def _fast_itinerary_array(itineraries: list) -> list:
+    if type(itineraries) is not list or len(itineraries) == 0:
+        raise TypeError
+    return [dict(key=_fast_str(it['key']), segmentStart=_fast_int(it['segmentStart']),
+                 segmentEnd=_fast_int(it['segmentEnd']), preReposition=_fast_flight(it['preReposition']),
+                 trip=_fast_flight(it['trip']), posReposition=_fast_flight(it['posReposition']))
+            for it in map(_fast_dict, itineraries)]
+
+
+def _fast_aircraft(aircraft: dict) -> dict:
+    aircraft = _fast_dict(aircraft)
+    code = aircraft.get('aircraftCode')
+    return dict(aircraftCode=None if code is None else _fast_str(code), seats=_fast_int(aircraft.get('seats', 0)))
+
+
+def _fast_calendar_payload(value) -> dict:
+    value = _fast_dict(value)
+    aircraft_data = value['processedAircraftData']
+    n_best = _fast_int(value.get('n_best', 1))
+    if type(aircraft_data) is not list or not 0 < n_best <= settings.MAX_N_BEST:
+        raise TypeError
+    return dict(processedAircraftData=[dict(departureItineraryArray=_fast_itinerary_array(p['departureItineraryArray']),
+                                            returnItineraryArray=_fast_itinerary_array(p['returnItineraryArray']),
+                                            processedAircraft=_fast_aircraft(p['processedAircraft']))
+                                       for p in map(_fast_dict, aircraft_data)],
+                n_best=n_best)
+
+
+class CalendarPayloadSC(dict):
+    """
+    Request body validated as CalendarInformationSC but kept as the plain dict of CalendarInformationSC.dict():
+    well-formed bodies are checked and copied in a single pass, anything else (coercions, errors) goes
+    through CalendarInformationSC to keep the same values and error messages
+    """
+
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, value) -> dict:
+        with timed_stage('validation'):
+            try:
+                return _fast_calendar_payload(value)
+            except (TypeError, ValueError, KeyError, AttributeError):
+                return CalendarInformationSC.validate(value).dict()
+
+    @classmethod
+    def __modify_schema__(cls, field_schema: dict):
+        field_schema.clear()
+        field_schema.update({'$ref': '#/components/schemas/CalendarInformationSC'})
 
 
 class MinCostRoundTripAnswerSC(ORMBaselModel):
@@ -58,5 +168,11 @@ class MinCostRoundTripAnswerSC(ORMBaselModel):
     returnAircraft: str = ''
     price: str = ''
     isSameSegmentOrContinuous: bool = False
-    departurePath: ProcessedItinerarySC
-    returnPath: ProcessedItinerarySC
+    departurePath: Optional[ProcessedItinerarySC] = None
+    returnPath: Optional[ProcessedItinerarySC] = None
+
+
+class BatchItemAnswerSC(ORMBaselModel):
+    status: str
+    answers: List[MinCostRoundTripAnswerSC] = []
+    error: Optional[str] = None
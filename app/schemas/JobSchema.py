@@ -0,0 +1,16 @@
+import datetime as dt
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from app.schemas.GLPKSchema import MinCostRoundTripAnswerSC
+
+
+class Public(BaseModel):
+    public_id: str
+    status: str
+    engine: str
+    result: Optional[List[MinCostRoundTripAnswerSC]] = None
+    error: Optional[str] = None
+    created_at: dt.datetime
+    updated_at: dt.datetime
@@ -0,0 +1,12 @@
+from typing import List
+
+from pydantic import BaseModel
+
+from app.schemas.GLPKSchema import MinCostRoundTripAnswerSC
+
+
+class Public(BaseModel):
+    session_id: str
+    n_best: int
+    aircrafts: List[str]
+    answers: List[MinCostRoundTripAnswerSC]
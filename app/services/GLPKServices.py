@@ -1,15 +1,143 @@
-from typing import List
+import asyncio
+import datetime as dt
+from typing import List, Optional, Tuple
 
+from app.common.ResultCache import ResultCache, canonical_hash
+from app.core.config import settings, database_file_path
 from app.core.exception_handler import INVALID_DATA_REQUEST_MSG
+from app.core.metrics import CACHE_REQUESTS, record_solver_stats
+from app.core.profiling import run_profiled
+from app.core.solver_pool import run_in_solver_pool, admitted_group, solver_pool_size
+from app.schemas.GLPKSchema import CalendarInformationSC
 from modeling.classes.ProcessedAircraftData import ProcessedAircraftData
-from modeling.models import minCostRoundTripModel
+from modeling.models import minCostRoundTripModel, solverBackends
 from modeling.models.minCostRoundTripAnswer import MinCostRoundTripAnswer
+from modeling.models.utils import timeStage, generateAircraftsAndAirports
 
+round_trip_cache = ResultCache(max_size=settings.RESULT_CACHE_SIZE, ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+                               db_file_path=database_file_path(settings.RESULT_CACHE_DB_FILE_NAME)
+                               if settings.RESULT_CACHE_DB_FILE_NAME else None)
+# one per process: every solver pool worker keeps its own templates
+model_templates = minCostRoundTripModel.ModelTemplateCache(settings.MODEL_TEMPLATE_CACHE_SIZE) \
+    if settings.MODEL_TEMPLATE_CACHE_SIZE > 0 else None
 
-def run_round_trip_model_service(data: List[ProcessedAircraftData]):
-    solver_results, model, summary = minCostRoundTripModel.run_model(data)
+
+def run_round_trip_model_service(data: List[ProcessedAircraftData], engine: str = minCostRoundTripModel.MILP_ENGINE,
+                                 n_best: int = 1, stats: dict = None) -> List[MinCostRoundTripAnswer]:
+    # the n_best ranked alternatives come from a single solve
+    if engine == minCostRoundTripModel.DIRECT_ENGINE:
+        summary = minCostRoundTripModel.run_direct_model(data, n_best=n_best, stats=stats)
+    elif engine == minCostRoundTripModel.DECOMPOSED_ENGINE:
+        # the subproblems are solved one after the other: the requests are already spread over the solver pool,
+        # and a pool per problem costs more (process start and imports) than the subproblems themselves
+        solver_results, model, summary = minCostRoundTripModel.run_model(
+            data, n_best=n_best, solver_backend=settings.SOLVER_BACKEND or None, decomposed=True, stats=stats)
+    else:
+        solver_results, model, summary = minCostRoundTripModel.run_model(
+            data, n_best=n_best, solver_backend=settings.SOLVER_BACKEND or None, templates=model_templates,
+            stats=stats)
+    return valid_summary(summary)
+
+
+def warm_up_study_case() -> List[ProcessedAircraftData]:
+    # small generated calendar (2 aircraft, 2 days) with feasible round trips
+    from modeling.classes.ItineraryGenerator import ItineraryGenerator
+    aircrafts, airport_names = generateAircraftsAndAirports(2, 3, seed=1)
+    itinerary_gen = ItineraryGenerator(aircrafts=aircrafts, airport_names=airport_names, n_days=2,
+                                       start_hour=dt.timedelta(hours=6), end_hour=dt.timedelta(hours=20), seed=1)
+    return itinerary_gen.generateStudyCaseRoundTrip(from_airport=airport_names[0], to_airport=airport_names[1])
+
+
+def warm_up() -> str:
+    """
+    Throwaway solve with the default engine: the modeling libraries, the solver backend and the smallest model
+    template of this process are loaded before the first request. Returns the name of the backend
+    """
+    backend, _ = solverBackends.selectBackend(settings.SOLVER_BACKEND or None)
+    run_round_trip_model_service(warm_up_study_case(), engine=settings.ROUND_TRIP_ENGINE)
+    return backend
+
+
+def valid_summary(summary: Optional[List[MinCostRoundTripAnswer]]) -> List[MinCostRoundTripAnswer]:
     if summary is not None and len(summary) > 0:
-        return summary[0]
+        return summary
     non_valid_answer = MinCostRoundTripAnswer()
     non_valid_answer.msg = INVALID_DATA_REQUEST_MSG
-    return non_valid_answer
+    return [non_valid_answer]
+
+
+def solve_calendar_payload(payload: dict, engine: str = minCostRoundTripModel.MILP_ENGINE,
+                           stats: dict = None) -> List[dict]:
+    # payload: CalendarInformationSC.dict(), the answers are returned serialized (it runs in the solver pool too)
+    with timeStage(stats, 'conversion'):
+        valid_processed_aircraft_data = [ProcessedAircraftData.from_dict(p) for p in payload['processedAircraftData']]
+    summary = run_round_trip_model_service(valid_processed_aircraft_data, engine=engine, n_best=payload['n_best'],
+                                           stats=stats)
+    with timeStage(stats, 'conversion'):
+        return [answer.to_dict() for answer in summary]
+
+
+def solve_calendar_payload_with_stats(payload: dict, engine: str = minCostRoundTripModel.MILP_ENGINE) \
+        -> Tuple[List[dict], dict]:
+    # the stats measured in the solver pool go back to the web process with the answers
+    stats = dict()
+    return solve_calendar_payload(payload, engine, stats), stats
+
+
+def cache_lookup(payload: dict, engine: str) -> Tuple[str, Optional[List[dict]]]:
+    key = canonical_hash(payload, engine)
+    return key, round_trip_cache.get(key)
+
+
+async def cached_round_trip_payload_service(payload: dict, engine: str = minCostRoundTripModel.MILP_ENGINE,
+                                            admitted: bool = False) -> List[dict]:
+    # payload: CalendarInformationSC.dict(). Identical calendars (in any aircraft order) are answered from the
+    # cache, the rest go to the solver pool (admitted: part of a batch already admitted in the pool)
+    # the hash of the payload and the sqlite tier of the cache run in a thread, out of the event loop
+    loop = asyncio.get_running_loop()
+    key, response = await loop.run_in_executor(None, cache_lookup, payload, engine)
+    CACHE_REQUESTS.inc(result='miss' if response is None else 'hit')
+    if response is None:
+        response, stats = await run_in_solver_pool(solve_calendar_payload_with_stats, payload, engine,
+                                                   admitted=admitted)
+        record_solver_stats(engine, stats)
+        await loop.run_in_executor(None, round_trip_cache.set, key, response)
+    return response
+
+
+async def profiled_round_trip_payload_service(payload: dict, engine: str = minCostRoundTripModel.MILP_ENGINE) \
+        -> Tuple[List[dict], str]:
+    # the cache is skipped: the problem is always solved (and profiled). Returns the answers and the profile id
+    (response, stats), profile_id = await run_in_solver_pool(run_profiled, solve_calendar_payload_with_stats,
+                                                             payload, engine)
+    record_solver_stats(engine, stats)
+    return response, profile_id
+
+
+async def cached_round_trip_model_service(calendar: CalendarInformationSC,
+                                          engine: str = minCostRoundTripModel.MILP_ENGINE,
+                                          admitted: bool = False) -> List[dict]:
+    return await cached_round_trip_payload_service(calendar.dict(), engine, admitted)
+
+
+async def batch_item_service(calendar: CalendarInformationSC, engine: str, slots: asyncio.Semaphore) -> dict:
+    try:
+        async with slots:
+            response = await cached_round_trip_model_service(calendar, engine, admitted=True)
+    except Exception as e:
+        return dict(status='error', answers=[], error=f"{e}")
+    if response[0]['isSuccess']:
+        return dict(status='ok', answers=response, error=None)
+    return dict(status='error', answers=[], error=response[0]['msg'])
+
+
+async def batch_round_trip_model_service(calendars: List[CalendarInformationSC],
+                                         engine: str = minCostRoundTripModel.MILP_ENGINE) -> List[dict]:
+    # the batch is admitted (or rejected with a single 503) at once and uses up to one worker per problem:
+    # its problems wait for one of them instead of failing. gather keeps the input order
+    n_slots = min(len(calendars), solver_pool_size())
+    if n_slots == 0:
+        return []
+    with admitted_group(n_slots):
+        slots = asyncio.Semaphore(n_slots)
+        return list(await asyncio.gather(*[batch_item_service(calendar, engine, slots) for calendar in calendars]))
@@ -0,0 +1,206 @@
+import asyncio
+import datetime as dt
+import json
+import multiprocessing
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.common.DefaultLogger import configure_logger
+from app.core.config import settings
+from app.core.solver_pool import SolverPoolSaturatedError, SolverTaskTimeoutError
+from app.db.models.Job import Job, QUEUED, RUNNING, DONE, FAILED, CANCELLED
+from app.db.session import SessionLocal
+from app.schemas.GLPKSchema import CalendarInformationSC
+from app.services.GLPKServices import solve_calendar_payload, cached_round_trip_model_service
+
+log = configure_logger("errors.log")
+
+JOB_INTERRUPTED_MSG = 'The job was interrupted by a stop of the server'
+JOB_PROCESS_FAILED_MSG = 'The job process stopped unexpectedly'
+
+# The database is the queue: every web worker claims queued jobs (whichever worker received them) and runs each one
+# in its own process, that is terminated when the job is cancelled (by any worker)
+_running_jobs = dict()
+_wake_up = None
+_dispatcher = None
+
+
+def get_by_public_id(db: Session, public_id: str) -> Job:
+    return db.query(Job).filter(Job.public_id == public_id).first()
+
+
+def create(db: Session, request: dict, engine: str, **values) -> Job:
+    db_job = Job(request=request, engine=engine, **values)
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def update_status(db: Session, public_id: str, from_status: tuple, to_status: str, result: List[dict] = None,
+                  error: str = None) -> bool:
+    # the status only changes if the job is still in one of from_status (e.g. a cancelled job is never overwritten)
+    values = dict(status=to_status)
+    if result is not None:
+        values['result'] = json.dumps(result)
+    if error is not None:
+        values['error'] = error
+    n_rows = db.query(Job).filter(Job.public_id == public_id, Job.status.in_(from_status)).update(
+        values, synchronize_session=False)
+    db.commit()
+    return n_rows > 0
+
+
+def finish(db: Session, public_id: str, response: List[dict]):
+    if response[0]['isSuccess']:
+        update_status(db, public_id, (QUEUED, RUNNING), DONE, result=response)
+    else:
+        update_status(db, public_id, (QUEUED, RUNNING), FAILED, error=response[0]['msg'])
+
+
+def run_job(public_id: str):
+    # this runs in the process of the job: the job is loaded from (and its result saved in) the database
+    db = SessionLocal()
+    try:
+        db_job = get_by_public_id(db, public_id)
+        if db_job is None or db_job.status != RUNNING:
+            return
+        try:
+            response = solve_calendar_payload(json.loads(db_job.request), db_job.engine)
+        except Exception as e:
+            update_status(db, public_id, (RUNNING,), FAILED, error=f"{e}")
+            return
+        finish(db, public_id, response)
+    finally:
+        db.close()
+
+
+def in_db_session(fn, *args):
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+def claim_next(db: Session) -> Optional[str]:
+    # the oldest queued job: the update only succeeds in one of the workers that try to claim it
+    for public_id, in db.query(Job.public_id).filter(Job.status == QUEUED).order_by(Job.id).limit(10).all():
+        if update_status(db, public_id, (QUEUED,), RUNNING):
+            return public_id
+    return None
+
+
+def heartbeat(db: Session, public_id: str) -> bool:
+    # updated_at of a running job is refreshed while its process is alive. False: cancelled (or finished)
+    return update_status(db, public_id, (RUNNING,), RUNNING)
+
+
+def fail_interrupted(db: Session) -> int:
+    # running jobs without heartbeat were left by a server that stopped without requeueing them
+    deadline = dt.datetime.utcnow() - dt.timedelta(seconds=settings.JOB_HEARTBEAT_TIMEOUT_SECONDS)
+    n_rows = db.query(Job).filter(Job.status == RUNNING, Job.updated_at < deadline).update(
+        dict(status=FAILED, error=JOB_INTERRUPTED_MSG), synchronize_session=False)
+    db.commit()
+    return n_rows
+
+
+async def run_in_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+async def watch_job(public_id: str):
+    """ Runs the job in a new process and terminates it when the job is cancelled """
+    process = multiprocessing.get_context('spawn').Process(target=run_job, args=(public_id,), daemon=True)
+    process.start()
+    try:
+        while process.is_alive():
+            await asyncio.sleep(settings.JOB_POLL_SECONDS)
+            if process.is_alive() and not await run_in_thread(in_db_session, heartbeat, public_id):
+                process.terminate()
+        await run_in_thread(process.join)
+        if process.exitcode != 0:
+            # a cancelled job is kept cancelled
+            await run_in_thread(in_db_session, lambda db: update_status(db, public_id, (RUNNING,), FAILED,
+                                                                        error=JOB_PROCESS_FAILED_MSG))
+    except asyncio.CancelledError:
+        # the server stops: the job is queued again to be run by another (or the next) server
+        process.terminate()
+        process.join()
+        in_db_session(lambda db: update_status(db, public_id, (RUNNING,), QUEUED))
+        raise
+    finally:
+        _running_jobs.pop(public_id, None)
+        _wake_up.set()
+
+
+async def dispatch_jobs():
+    while True:
+        try:
+            await run_in_thread(in_db_session, fail_interrupted)
+            while len(_running_jobs) < settings.JOB_POOL_SIZE:
+                public_id = await run_in_thread(in_db_session, claim_next)
+                if public_id is None:
+                    break
+                _running_jobs[public_id] = asyncio.create_task(watch_job(public_id))
+        except Exception as e:
+            log.error(f"Job dispatcher: {e}")
+        # new jobs of this worker wake it up, the ones of the other workers are found in the next poll
+        try:
+            await asyncio.wait_for(_wake_up.wait(), timeout=settings.JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wake_up.clear()
+
+
+def start_job_dispatcher():
+    global _wake_up, _dispatcher
+    _wake_up = asyncio.Event()
+    _dispatcher = asyncio.create_task(dispatch_jobs())
+
+
+async def stop_job_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        return
+    _dispatcher.cancel()
+    tasks = list(_running_jobs.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(_dispatcher, *tasks, return_exceptions=True)
+    _dispatcher = None
+
+
+def pair_count(calendar: CalendarInformationSC) -> int:
+    n_departure = sum(len(p.departureItineraryArray) for p in calendar.processedAircraftData)
+    n_return = sum(len(p.returnItineraryArray) for p in calendar.processedAircraftData)
+    return n_departure * n_return
+
+
+async def submit(db: Session, calendar: CalendarInformationSC, engine: str) -> Job:
+    # the database calls are blocking: they run in a thread, out of the event loop
+    if pair_count(calendar) <= settings.JOB_SYNC_MAX_PAIRS:
+        # short problems keep using the synchronous path: the job is saved already finished
+        try:
+            response = await cached_round_trip_model_service(calendar, engine)
+        except (SolverPoolSaturatedError, SolverTaskTimeoutError):
+            # the solver pool is busy (or the problem is not that short): the job is queued instead
+            pass
+        except Exception as e:
+            return await run_in_thread(lambda: create(db, calendar.dict(), engine, status=FAILED, error=f"{e}"))
+        else:
+            values = dict(status=DONE, result=json.dumps(response)) if response[0]['isSuccess'] else \
+                dict(status=FAILED, error=response[0]['msg'])
+            return await run_in_thread(lambda: create(db, calendar.dict(), engine, **values))
+    db_job = await run_in_thread(create, db, calendar.dict(), engine)
+    if _wake_up is not None:
+        _wake_up.set()
+    return db_job
+
+
+def cancel(db: Session, db_job: Job) -> Optional[Job]:
+    # the worker running the job terminates its process in the next poll
+    update_status(db, db_job.public_id, (QUEUED, RUNNING), CANCELLED)
+    db.refresh(db_job)
+    return db_job
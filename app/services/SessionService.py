@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import uuid
+from typing import Optional
+
+from app.common.ResultCache import ResultCache
+from app.core.config import settings
+from app.services.GLPKServices import valid_summary
+from modeling.classes.ProcessedAircraftData import ProcessedAircraftData
+from modeling.models.roundTripSession import RoundTripSession
+
+# session id -> (RoundTripSession, lock). The sessions live in this process: they are not shared by several workers
+sessions = ResultCache(max_size=settings.SESSION_MAX_COUNT, ttl_seconds=settings.SESSION_TTL_SECONDS)
+
+
+def session_response(session_id: str, session: RoundTripSession) -> dict:
+    return dict(session_id=session_id, n_best=session.n_best, aircrafts=session.aircrafts,
+                answers=[answer.to_dict() for answer in valid_summary(session.bestAnswers())])
+
+
+def create_session(payload: dict) -> dict:
+    # payload: CalendarInformationSC.dict()
+    data = [ProcessedAircraftData.from_dict(p) for p in payload['processedAircraftData']]
+    session = RoundTripSession(data, n_best=payload['n_best'])
+    session_id = str(uuid.uuid4())
+    sessions.set(session_id, (session, threading.Lock()))
+    return session_response(session_id, session)
+
+
+def update_session_aircraft(session_id: str, entry: tuple, aircraft_data: dict) -> dict:
+    session, lock = entry
+    with lock:
+        session.setAircraft(ProcessedAircraftData.from_dict(aircraft_data))
+        response = session_response(session_id, session)
+    # the lifetime of the session counts from its last change
+    sessions.set(session_id, entry)
+    return response
+
+
+def read_session(session_id: str, entry: tuple) -> dict:
+    session, lock = entry
+    with lock:
+        return session_response(session_id, session)
+
+
+async def run_in_thread(fn, *args):
+    # the state of the sessions is in this process, they are computed in a thread instead of the solver pool
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+async def create(payload: dict) -> dict:
+    return await run_in_thread(create_session, payload)
+
+
+async def update_aircraft(session_id: str, aircraft_data: dict) -> Optional[dict]:
+    # aircraft_data: ProcessedAircraftDataSC.dict(), a new aircraft code is added to the session
+    entry = sessions.get(session_id)
+    if entry is None:
+        return None
+    return await run_in_thread(update_session_aircraft, session_id, entry, aircraft_data)
+
+
+async def get(session_id: str) -> Optional[dict]:
+    entry = sessions.get(session_id)
+    if entry is None:
+        return None
+    return await run_in_thread(read_session, session_id, entry)
+
+
+def delete(session_id: str) -> bool:
+    return sessions.delete(session_id)
@@ -1,13 +1,48 @@
+import glob
 import os
+import sys
+import tempfile
 import uvicorn
 
 
 def run_production_api():
     os.environ["ENV"] = 'prod'
+    # every web worker starts (and warms up) its solver workers before serving
+    os.environ.setdefault("PREWARM", "true")
+    from app.core.config import settings
+
+    cpus = os.cpu_count() or 1
+    workers = settings.WEB_WORKERS if settings.WEB_WORKERS > 0 else cpus
+    if "sessions" in settings.ROUTERS:
+        # the sessions live in the memory of one web worker: another worker (or the one replacing it) does not know
+        # them
+        if settings.WEB_WORKERS > 1 or settings.WEB_WORKER_MAX_REQUESTS:
+            sys.exit(">>>>> \tThe sessions need a single web worker that is never replaced: set WEB_WORKERS=1 and "
+                     "WEB_WORKER_MAX_REQUESTS=0, or leave sessions out of ROUTERS")
+        workers = 1
+    if "SOLVER_POOL_SIZE" not in os.environ:
+        # the web workers share the CPUs: one solver process per CPU in total
+        os.environ["SOLVER_POOL_SIZE"] = f"{max(1, cpus // workers)}"
+
+    if workers > 1 and "metrics" in settings.ROUTERS:
+        # /metrics adds up the metrics that every worker writes in METRICS_DIR, the ones of this run only
+        if not settings.METRICS_DIR:
+            os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="metrics-")
+        for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "*.json")):
+            os.remove(path)
+
     host = "0.0.0.0"
-    port = os.getenv("API_PORT", 8000)
-    print(f">>>>> \tUI API deployed over: http://{host}:{port}/docs")
-    uvicorn.run("app.main:api", host=host, port=port)
+    port = int(os.getenv("API_PORT", 8000))
+    print(f">>>>> \tUI API deployed over: http://{host}:{port}/docs ({workers} workers, "
+          f"{os.environ['SOLVER_POOL_SIZE']} solver processes per worker)")
+    if workers == 1 and settings.WEB_WORKER_MAX_REQUESTS:
+        print(">>>>> \tWith a single worker the server stops after WEB_WORKER_MAX_REQUESTS requests: "
+              "the workers are only replaced by uvicorn when WEB_WORKERS > 1")
+    # a worker that served WEB_WORKER_MAX_REQUESTS requests finishes the ones in progress and is replaced
+    uvicorn.run("app.main:api", host=host, port=port, workers=workers,
+                limit_max_requests=settings.WEB_WORKER_MAX_REQUESTS or None,
+                limit_max_requests_jitter=settings.WEB_WORKER_MAX_REQUESTS_JITTER,
+                timeout_graceful_shutdown=settings.WEB_GRACEFUL_SHUTDOWN_SECONDS)
 
 
 if __name__ == "__main__":
@@ -2,12 +2,20 @@ from pydantic.main import BaseModel
 
 
 class Aircraft:
-    aircraftCode: str = None
-    seats: int = 0
+    __slots__ = ('aircraftCode', 'seats')
+    aircraftCode: str
+    seats: int
 
-    def __init__(self, **kwargs):
-        for key, value in kwargs.items():
-            setattr(self, key, value)
+    def __init__(self, aircraftCode: str = None, seats: int = 0):
+        self.aircraftCode = aircraftCode
+        self.seats = seats
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data.get('aircraftCode'), data.get('seats', 0))
 
     def __str__(self, ):
         return f'({self.aircraftCode}: {self.seats})'
+
+    def to_dict(self):
+        return dict(aircraftCode=self.aircraftCode, seats=self.seats)
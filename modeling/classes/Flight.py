@@ -2,14 +2,21 @@ from pydantic.main import BaseModel
 
 
 class Flight:
-    fromAirport: str = None
-    toAirport: str = None
-    price: float = None
-    timeInMin: int = None
+    __slots__ = ('fromAirport', 'toAirport', 'price', 'timeInMin')
+    fromAirport: str
+    toAirport: str
+    price: float
+    timeInMin: int
 
-    def __init__(self, **kwargs):
-        for key, value in kwargs.items():
-            setattr(self, key, value)
+    def __init__(self, fromAirport: str = None, toAirport: str = None, price: float = None, timeInMin: int = None):
+        self.fromAirport = fromAirport
+        self.toAirport = toAirport
+        self.price = price
+        self.timeInMin = timeInMin
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data.get('fromAirport'), data.get('toAirport'), data.get('price'), data.get('timeInMin'))
 
     def __str__(self, ):
         return f'({round(self.timeInMin, 0)} min.) {self.fromAirport} -> ' \
@@ -1,7 +1,8 @@
 import random
 from random import randint
-from typing import List
+from typing import Iterator, List, Sequence, Union
 from uuid import uuid4
+import numpy as np
 import pandas as pd
 import datetime as dt
 
@@ -11,12 +12,21 @@ from modeling.classes.ProcessedAircraftData import ProcessedAircraftData
 from modeling.classes.ProcessedItinerary import ProcessedItinerary
 from modeling.models.utils import generateParameters, generateDayValidPeriodsPerDay
 
+# itineraries kept by generateAircraftCase for a day in different segments:
+DEPARTURE_AND_RETURN = 0
+DEPARTURE_ONLY = 1
+RETURN_ONLY = 2
+
 
 class ItineraryGenerator:
     seed: int
     airportNames: list
     aircrafts: List[Aircraft] = []
     aircraftNames: list
+    aircraftIndex: dict
+    airportIndex: dict
+    time: np.ndarray
+    cost: np.ndarray
     time_dict: dict
     cost_dict: dict
     n_days: int
@@ -32,14 +42,22 @@ class ItineraryGenerator:
         self.aircrafts = aircrafts
         self.airportNames = airport_names
         self.aircraftNames = [a.aircraftCode for a in self.aircrafts]
-        speed_dict, df_dist, time_dict, cost_dict = generateParameters(self.aircraftNames, self.airportNames, self.seed)
-        self.time_dict = time_dict
-        self.cost_dict = cost_dict
+        self.aircraftIndex = {ac: ix for ix, ac in enumerate(self.aircraftNames)}
+        self.airportIndex = {airport: ix for ix, airport in enumerate(self.airportNames)}
+        # (aircraft, airport, airport) tensors, time_dict and cost_dict are labeled views of them
+        speed_dict, dist, self.time, self.cost = generateParameters(self.aircraftNames, self.airportNames, self.seed,
+                                                                    as_frame=False)
+        self.time_dict = self.labeledView(self.time)
+        self.cost_dict = self.labeledView(self.cost)
         self.df_days = generateDayValidPeriodsPerDay(n_days, start_hour, end_hour)
         self.tv_i = int(start_hour.total_seconds() / 60)
         self.tv_f = int(end_hour.total_seconds() / 60)
         self.last_picket_airport = ''
 
+    def labeledView(self, tensor: np.ndarray) -> dict:
+        return {ac: pd.DataFrame(tensor[ix], index=self.airportNames, columns=self.airportNames, copy=False)
+                for ac, ix in self.aircraftIndex.items()}
+
     def createItinerary(self, ac: str, px: str, pe: str, pf: str, py: str, t_ini: int, t_free: int, max_time: int,
                         key=None, next_possible_segments=None):
         if next_possible_segments is None:
@@ -47,14 +65,14 @@ class ItineraryGenerator:
 
         if key is None:
             key = f"{uuid4()}"
-        txe = self.time_dict[ac][px][pe]
-        tef = self.time_dict[ac][pe][pf]
-        tfy = self.time_dict[ac][pf][py]
+        a, x, e, f, y = self.aircraftIndex[ac], self.airportIndex[px], self.airportIndex[pe], \
+            self.airportIndex[pf], self.airportIndex[py]
+        txe, tef, tfy = self.time[a, x, e].item(), self.time[a, e, f].item(), self.time[a, f, y].item()
         total_time = txe + tef + tfy + t_free
         t_fin = t_ini + total_time if t_ini + total_time < max_time else max_time
-        pre_price = self.cost_dict[ac][px][pe]
-        trip_price = self.cost_dict[ac][pe][pf]
-        post_price = self.cost_dict[ac][pf][py]
+        pre_price = self.cost[a, x, e].item()
+        trip_price = self.cost[a, e, f].item()
+        post_price = self.cost[a, f, y].item()
         pre_flight = Flight(fromAirport=px, toAirport=pe, price=pre_price, timeInMin=txe)
         trip_flight = Flight(fromAirport=pe, toAirport=pf, price=trip_price, timeInMin=tef)
         post_flight = Flight(fromAirport=pf, toAirport=py, price=post_price, timeInMin=tfy)
@@ -62,6 +80,47 @@ class ItineraryGenerator:
                                   preReposition=pre_flight, trip=trip_flight, posReposition=post_flight,
                                   nextPossibleSegments=next_possible_segments)
 
+    def airportIndexes(self, airports: Union[str, Sequence[str]], n: int) -> np.ndarray:
+        # one airport for all the itineraries or one per itinerary
+        if isinstance(airports, str):
+            return np.full(n, self.airportIndex[airports], dtype=np.int64)
+        return np.fromiter((self.airportIndex[airport] for airport in airports), dtype=np.int64, count=n)
+
+    def createItineraries(self, ac: str, px: Union[str, Sequence[str]], pe: Union[str, Sequence[str]],
+                          pf: Union[str, Sequence[str]], py: Union[str, Sequence[str]], t_ini: Sequence[int],
+                          t_free: Sequence[int], max_time: Sequence[int], keys: Sequence[str] = None,
+                          next_possible_segments: Sequence[List[str]] = None) -> List[ProcessedItinerary]:
+        """
+        Same as createItinerary for a range of days (one itinerary per t_ini), with the times and prices
+        of all the itineraries read from the tensors at once
+        """
+        n = len(t_ini)
+        a = self.aircraftIndex[ac]
+        x, e, f, y = (self.airportIndexes(airports, n) for airports in (px, pe, pf, py))
+        txe, tef, tfy = self.time[a, x, e], self.time[a, e, f], self.time[a, f, y]
+        t_end = np.asarray(t_ini, dtype=np.float64) + (txe + tef + tfy + np.asarray(t_free, dtype=np.float64))
+        max_time = np.asarray(max_time, dtype=np.float64)
+        t_fin = np.where(t_end < max_time, t_end, max_time)
+        pre_price, trip_price, post_price = self.cost[a, x, e], self.cost[a, e, f], self.cost[a, f, y]
+
+        airport_names = self.airportNames
+        if keys is None:
+            keys = [f"{uuid4()}" for _ in range(n)]
+        if next_possible_segments is None:
+            next_possible_segments = [[] for _ in range(n)]
+        columns = zip(x.tolist(), e.tolist(), f.tolist(), y.tolist(), txe.tolist(), tef.tolist(), tfy.tolist(),
+                      pre_price.tolist(), trip_price.tolist(), post_price.tolist(), t_ini, t_fin.tolist(),
+                      keys, next_possible_segments)
+        return [ProcessedItinerary(key=key, segmentStart=start, segmentEnd=end,
+                                   preReposition=Flight(fromAirport=airport_names[i], toAirport=airport_names[j],
+                                                        price=c_ij, timeInMin=t_ij),
+                                   trip=Flight(fromAirport=airport_names[j], toAirport=airport_names[k],
+                                               price=c_jk, timeInMin=t_jk),
+                                   posReposition=Flight(fromAirport=airport_names[k], toAirport=airport_names[m],
+                                                        price=c_km, timeInMin=t_km),
+                                   nextPossibleSegments=segments)
+                for i, j, k, m, t_ij, t_jk, t_km, c_ij, c_jk, c_km, start, end, key, segments in columns]
+
     def selectRandomAirport(self, ):
         if self.seed is not None:
             random.seed(self.seed)
@@ -81,6 +140,8 @@ class ItineraryGenerator:
         if self.seed is not None:
             random.seed(self.seed)
 
+        # random draws per day first, then all the itineraries of the aircraft at once
+        days = list()
         continuous_segments_ids = list()
         origen_continuous, destiny_continuous = self.selectRandomAirport(), self.selectRandomAirport()
         for d in self.df_days.index:
@@ -95,53 +156,44 @@ class ItineraryGenerator:
                 _key = continuous_segments_ids[0]
 
                 t_ini, pos_ini, pos_fin, t_free = self.generateTimeInitialAndPositions(self.df_days['ini'].loc[d])
-                departure_itinerary = self.createItinerary(ac=ac, px=origen_continuous,
-                                                           pe=from_airport, pf=to_airport,
-                                                           py=destiny_continuous, t_ini=t_ini, t_free=t_free,
-                                                           max_time=self.df_days['end'].loc[d],
-                                                           key=f"{_key}", next_possible_segments=continuous_segments_ids)
-
-                return_itinerary = self.createItinerary(ac=ac, px=origen_continuous,
-                                                        pe=to_airport, pf=from_airport,
-                                                        py=destiny_continuous, t_ini=t_ini, t_free=t_free,
-                                                        max_time=self.df_days['end'].loc[d],
-                                                        key=f"{_key}", next_possible_segments=continuous_segments_ids)
-                return_itinerary.segmentEnd = departure_itinerary.segmentEnd
+                days.append((f"{_key}", continuous_segments_ids, origen_continuous, destiny_continuous, t_ini, t_free,
+                             self.df_days['end'].loc[d], DEPARTURE_AND_RETURN))
                 # for the next continuous segments
                 continuous_segments_ids = continuous_segments_ids[1:]
 
-                aircraft_case.departureItineraryArray.append(departure_itinerary)
-                aircraft_case.returnItineraryArray.append(return_itinerary)
-
             else:
                 # in different segments:
                 t_ini, pos_ini, pos_fin, t_free = self.generateTimeInitialAndPositions(self.df_days['ini'].loc[d])
-                departure_itinerary = self.createItinerary(ac=ac, px=pos_ini,
-                                                           pe=from_airport, pf=to_airport, py=pos_fin,
-                                                           t_ini=t_ini, t_free=t_free,
-                                                           max_time=self.df_days['end'].loc[d],
-                                                           key=f"{key}", next_possible_segments=[f"{key}"])
-                return_itinerary = self.createItinerary(ac=ac, px=pos_ini,
-                                                        pe=to_airport, pf=from_airport, py=pos_fin,
-                                                        t_ini=t_ini, t_free=t_free,
-                                                        max_time=self.df_days['end'].loc[d],
-                                                        key=f"{key}", next_possible_segments=[f"{key}"])
-
-                return_itinerary.segmentEnd = departure_itinerary.segmentEnd
-
                 to_eval = randint(1, 1000)
                 if to_eval % 2 == 0:
-                    aircraft_case.departureItineraryArray.append(departure_itinerary)
+                    kept = DEPARTURE_ONLY
                 elif to_eval % 3 == 0:
-                    aircraft_case.returnItineraryArray.append(return_itinerary)
+                    kept = RETURN_ONLY
                 else:
-                    aircraft_case.departureItineraryArray.append(departure_itinerary)
-                    aircraft_case.returnItineraryArray.append(return_itinerary)
+                    kept = DEPARTURE_AND_RETURN
+                days.append((f"{key}", [f"{key}"], pos_ini, pos_fin, t_ini, t_free, self.df_days['end'].loc[d], kept))
+
+        if len(days) == 0:
+            return aircraft_case
+
+        keys, segments, px, py, t_ini, t_free, max_time, kept = zip(*days)
+        departure_itineraries = self.createItineraries(ac=ac, px=px, pe=from_airport, pf=to_airport, py=py,
+                                                       t_ini=t_ini, t_free=t_free, max_time=max_time, keys=keys,
+                                                       next_possible_segments=segments)
+        return_itineraries = self.createItineraries(ac=ac, px=px, pe=to_airport, pf=from_airport, py=py,
+                                                    t_ini=t_ini, t_free=t_free, max_time=max_time, keys=keys,
+                                                    next_possible_segments=segments)
+        for departure_itinerary, return_itinerary, day_kept in zip(departure_itineraries, return_itineraries, kept):
+            return_itinerary.segmentEnd = departure_itinerary.segmentEnd
+            if day_kept != RETURN_ONLY:
+                aircraft_case.departureItineraryArray.append(departure_itinerary)
+            if day_kept != DEPARTURE_ONLY:
+                aircraft_case.returnItineraryArray.append(return_itinerary)
 
         return aircraft_case
 
-    def generateStudyCaseRoundTrip(self, from_airport: str, to_airport: str):
-        aircraft_study_case = list()
+    def iterStudyCaseRoundTrip(self, from_airport: str, to_airport: str) -> Iterator[ProcessedAircraftData]:
+        # one aircraft case at a time: the whole study case is never held in memory
         aircraft_dict = dict()
         for ac in self.aircrafts:
             aircraft_dict[ac.aircraftCode] = ac
@@ -149,7 +201,7 @@ class ItineraryGenerator:
         for ac in self.aircraftNames:
             aircraft_case = ProcessedAircraftData(processedAircraft=aircraft_dict[ac],
                                                   departureItineraryArray=[], returnItineraryArray=[])
-            aircraft_case = self.generateAircraftCase(aircraft_case, ac, from_airport, to_airport)
-            aircraft_study_case.append(aircraft_case)
+            yield self.generateAircraftCase(aircraft_case, ac, from_airport, to_airport)
 
-        return aircraft_study_case
+    def generateStudyCaseRoundTrip(self, from_airport: str, to_airport: str):
+        return list(self.iterStudyCaseRoundTrip(from_airport, to_airport))
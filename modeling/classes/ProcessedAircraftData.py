@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Union
 
 
 from modeling.classes.Aircraft import Aircraft
@@ -6,21 +6,37 @@ from modeling.classes.ProcessedItinerary import ProcessedItinerary
 
 
 class ProcessedAircraftData:
-    departureItineraryArray: List[ProcessedItinerary] = list()
-    returnItineraryArray: List[ProcessedItinerary] = list()
-    processedAircraft: Aircraft = None
+    __slots__ = ('departureItineraryArray', 'returnItineraryArray', 'processedAircraft')
+    departureItineraryArray: List[ProcessedItinerary]
+    returnItineraryArray: List[ProcessedItinerary]
+    processedAircraft: Aircraft
 
-    def __init__(self, **kwargs):
-        for key, value in kwargs.items():
-            setattr(self, key, value)
+    def __init__(self, departureItineraryArray: List[Union[ProcessedItinerary, dict]] = None,
+                 returnItineraryArray: List[Union[ProcessedItinerary, dict]] = None,
+                 processedAircraft: Union[Aircraft, dict] = None):
+        self.departureItineraryArray = departureItineraryArray if departureItineraryArray is not None else []
+        self.returnItineraryArray = returnItineraryArray if returnItineraryArray is not None else []
+        self.processedAircraft = processedAircraft
         if len(self.departureItineraryArray) > 0 and isinstance(self.departureItineraryArray[0], dict):
-            self.departureItineraryArray = [ProcessedItinerary(**d) for d in self.departureItineraryArray]
+            self.departureItineraryArray = [ProcessedItinerary.from_dict(d) for d in self.departureItineraryArray]
         if len(self.returnItineraryArray) > 0 and isinstance(self.returnItineraryArray[0], dict):
-            self.returnItineraryArray = [ProcessedItinerary(**d) for d in self.returnItineraryArray]
+            self.returnItineraryArray = [ProcessedItinerary.from_dict(d) for d in self.returnItineraryArray]
         if isinstance(self.processedAircraft, dict):
-            self.processedAircraft = Aircraft(**self.processedAircraft)
+            self.processedAircraft = Aircraft.from_dict(self.processedAircraft)
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls([ProcessedItinerary.from_dict(d) for d in data.get('departureItineraryArray', [])],
+                   [ProcessedItinerary.from_dict(d) for d in data.get('returnItineraryArray', [])],
+                   Aircraft.from_dict(data['processedAircraft']) if data.get('processedAircraft') else None)
 
     def __str__(self, ):
         dep = '\n'.join(str(x) for x in self.departureItineraryArray)
         back = '\n'.join(str(x) for x in self.returnItineraryArray)
         return f"departure:\n{dep} \nreturn:\n{back}"
+
+    def to_dict(self):
+        # same shape as ProcessedAircraftDataSC
+        return dict(departureItineraryArray=[x.to_dict() for x in self.departureItineraryArray],
+                    returnItineraryArray=[x.to_dict() for x in self.returnItineraryArray],
+                    processedAircraft=self.processedAircraft.to_dict() if self.processedAircraft is not None else dict())
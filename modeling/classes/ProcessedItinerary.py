@@ -1,26 +1,31 @@
-from typing import List
+from typing import List, Union
 from modeling.classes.Flight import Flight
 
 
 class ProcessedItinerary:
-    key: str = None
-    segmentStart: int = 0
-    segmentEnd: int = 0
-    preReposition: Flight = None
-    trip: Flight = None
-    posReposition: Flight = None
-    segmentTimeInMin: int = None
-    nextPossibleSegments: List[str] = list()
-
-    def __init__(self, **kwargs):
-        for key, value in kwargs.items():
-            setattr(self, key, value)
-        if isinstance(self.preReposition, dict):
-            self.preReposition = Flight(**self.preReposition)
-        if isinstance(self.trip, dict):
-            self.trip = Flight(**self.trip)
-        if isinstance(self.posReposition, dict):
-            self.posReposition = Flight(**self.posReposition)
+    __slots__ = ('key', 'segmentStart', 'segmentEnd', 'preReposition', 'trip', 'posReposition', 'segmentTimeInMin',
+                 'nextPossibleSegments')
+    key: str
+    segmentStart: int
+    segmentEnd: int
+    preReposition: Flight
+    trip: Flight
+    posReposition: Flight
+    segmentTimeInMin: int
+    nextPossibleSegments: List[str]
+
+    def __init__(self, key: str = None, segmentStart: int = 0, segmentEnd: int = 0,
+                 preReposition: Union[Flight, dict] = None, trip: Union[Flight, dict] = None,
+                 posReposition: Union[Flight, dict] = None, segmentTimeInMin: int = None,
+                 nextPossibleSegments: List[str] = None):
+        self.key = key
+        self.segmentStart = segmentStart
+        self.segmentEnd = segmentEnd
+        self.preReposition = Flight.from_dict(preReposition) if isinstance(preReposition, dict) else preReposition
+        self.trip = Flight.from_dict(trip) if isinstance(trip, dict) else trip
+        self.posReposition = Flight.from_dict(posReposition) if isinstance(posReposition, dict) else posReposition
+        self.segmentTimeInMin = segmentTimeInMin
+        self.nextPossibleSegments = nextPossibleSegments if nextPossibleSegments is not None else []
         if self.segmentEnd - self.segmentStart > 0:
             self.segmentTimeInMin = self.segmentEnd - self.segmentStart
         elif self.segmentEnd > 0 and self.segmentStart > 0:
@@ -29,6 +34,14 @@ class ProcessedItinerary:
                             f"{self.segmentEnd} - {self.segmentStart} = "
                             f"{self.segmentEnd - self.segmentStart}")
 
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data.get('key'), data.get('segmentStart', 0), data.get('segmentEnd', 0),
+                   Flight.from_dict(data['preReposition']) if data.get('preReposition') else None,
+                   Flight.from_dict(data['trip']) if data.get('trip') else None,
+                   Flight.from_dict(data['posReposition']) if data.get('posReposition') else None,
+                   data.get('segmentTimeInMin'), data.get('nextPossibleSegments'))
+
     def preTripPrice(self, ):
         return self.preReposition.price + self.trip.price
 
@@ -47,16 +60,17 @@ class ProcessedItinerary:
     def preTripPosTimeInMin(self, ):
         return self.preReposition.timeInMin + self.trip.timeInMin + self.posReposition.timeInMin
 
-    def isNextPossibleSegmentOf(self, to_evaluate):
-        return self.key in to_evaluate.nextPossibleSegments
-
     def __str__(self, ):
         return f'..{str(self.key)[-3:]}: {self.preReposition} {self.trip} {self.posReposition} : ' \
                f'({round(self.segmentStart, 0)}, {round(self.segmentEnd, 0)}) ' \
                f'= {round(self.preTripPosPrice(), 2)}'
 
-    def to_dict(self):
-        return dict(key=self.key, segmentStart=self.segmentStart, segmentEnd=self.segmentEnd,
+    def to_dict(self, with_next_segments: bool = True):
+        # the next possible segments are part of the study case (continuity), not of the answers
+        data = dict(key=self.key, segmentStart=self.segmentStart, segmentEnd=self.segmentEnd,
                     preReposition=self.preReposition.to_dict() if self.preReposition is not None else dict(),
                     trip=self.trip.to_dict() if self.trip is not None else dict(),
                     posReposition=self.posReposition.to_dict() if self.posReposition is not None else dict())
+        if with_next_segments:
+            data['nextPossibleSegments'] = list(self.nextPossibleSegments)
+        return data
@@ -15,10 +15,10 @@ class MinCostRoundTripAnswer:
 
     def to_dict(self):
         return dict(isSuccess=self.isSuccess, msg=self.msg, departureAircraft=self.departureAircraft,
-                    returnAircraft=self.returnAircraft, price=self.price,
+                    returnAircraft=self.returnAircraft, price=f'{self.price}',
                     isSameSegmentOrContinuous=self.isSameSegmentOrContinuous,
-                    departurePath=self.departurePath.to_dict(),
-                    returnPath=self.returnPath.to_dict())
+                    departurePath=self.departurePath.to_dict(with_next_segments=False) if self.isSuccess else None,
+                    returnPath=self.returnPath.to_dict(with_next_segments=False) if self.isSuccess else None)
 
     def __str__(self, ):
         return f'(success: {self.isSuccess}) {self.msg if not self.isSuccess else ""} ' \
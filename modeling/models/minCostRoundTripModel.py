@@ -1,37 +1,48 @@
-from typing import List, Union, Tuple
-import pyomo.environ as pm
-from pyomo.core import ConcreteModel
-from pyomo.opt import SolverResults
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Union, Tuple, TYPE_CHECKING
+
+import numpy as np
 
 from modeling.classes.ProcessedAircraftData import ProcessedAircraftData
-from modeling.classes.ProcessedItinerary import ProcessedItinerary
 from modeling.models.minCostRoundTripAnswer import MinCostRoundTripAnswer
+from modeling.models import solverBackends
+from modeling.models.roundTripMatrices import ColumnarItineraries, RoundTripMatrices
 from modeling.models.utils import dataToDict, is_valid_solution, NON_SUCCESSFUL_SOLVER_SOLUTION_MSG, \
-    SUCCESSFUL_SOLVER_SOLUTION_MSG
+    SUCCESSFUL_SOLVER_SOLUTION_MSG, timeStage, addCount, pm
+
+if TYPE_CHECKING:
+    from pyomo.core import ConcreteModel
+    from pyomo.opt import SolverResults
 
 model_name = 'minCostRoundTripModel v1.0'
 
+# available engines to solve the round trip problem:
+MILP_ENGINE = 'milp'
+DIRECT_ENGINE = 'direct'
+DECOMPOSED_ENGINE = 'decomposed'
 
-def calCostWithDetails(departure_itinerary: ProcessedItinerary, return_itinerary: ProcessedItinerary):
-    is_same_segment_or_continuous = departure_itinerary.key == return_itinerary.key or \
-                                    return_itinerary.isNextPossibleSegmentOf(departure_itinerary)
-    if is_same_segment_or_continuous:
-        # this implies either these two itineraries belong to the same segment or they are continuous
-        # therefore the following simplification applies.
-        # This simplifies: x->e, e->f, f->y | y->f, f->e, e->z
-        # with this:    x->e, e->f |  f->e, e->z
-        cost = departure_itinerary.preTripPrice() + return_itinerary.tripPosPrice()
-    else:
-        cost = departure_itinerary.preTripPosPrice() + return_itinerary.preTripPosPrice()
+# smallest shape (number of pairs) of the model templates
+MIN_TEMPLATE_CAPACITY = 256
 
-    return dict(cost=cost, isSameSegmentOrContinuous=is_same_segment_or_continuous)
 
+def run_model(data: List[ProcessedAircraftData], n_best: int = 1, solver_backend: str = None,
+              decomposed: bool = False, templates: ModelTemplateCache = None,
+              stats: dict = None) \
+        -> Union[Tuple[None, None, None], Tuple[SolverResults, ConcreteModel, list], Tuple[None, None, list]]:
+    """
+    stats (optional): filled with the seconds of each stage (build, solve, extraction), the backend, the number of
+    variables and constraints of the model and the number of feasible pairs
+    """
+    if decomposed:
+        # one model per aircraft pair: there is no single model nor solver result to return
+        summary = run_decomposed_model(data, n_best, solver_backend, stats)
+        return None, None, summary
 
-def run_model(data: List[ProcessedAircraftData], n_best: int = 1) -> Union[Tuple[None, None, None],
-                                                                           Tuple[SolverResults, ConcreteModel, list]]:
     """ PREPARE INFORMATION """
     data_dict = dataToDict(data)
-    aircrafts = list(data_dict.keys())
 
     n_departure = max([len(d.departureItineraryArray) for d in data])
     n_return = max([len(d.returnItineraryArray) for d in data])
@@ -39,9 +50,39 @@ def run_model(data: List[ProcessedAircraftData], n_best: int = 1) -> Union[Tuple
     if n_departure == 0 or n_return == 0:
         return None, None, None
 
-    indexes = [(a1, a2, i, j) for a1 in aircrafts for a2 in aircrafts for i in range(n_departure) for j in
-               range(n_return) if i < len(data_dict[a1].departureItineraryArray)
-               and j < len(data_dict[a2].returnItineraryArray)]
+    if templates is not None:
+        return run_template_model(data_dict, n_best, solver_backend, templates, stats)
+
+    with timeStage(stats, 'build'):
+        model, cost_data = build_model(data_dict, n_best)
+    if model is None:
+        return None, None, [non_successful_answer()]
+    addCount(stats, 'variables', len(cost_data))
+    addCount(stats, 'constraints', 1)
+    addCount(stats, 'feasible_pairs', len(cost_data))
+
+    with timeStage(stats, 'solve'):
+        solver_results = solverBackends.solve(model, solver_backend)
+    if stats is not None:
+        stats['backend'] = solver_results.solver.backend
+    with timeStage(stats, 'extraction'):
+        summary = get_final_results(solver_results, model, cost_data, data_dict)
+
+    return solver_results, model, summary
+
+
+def build_model(data_dict: dict, n_best: int = 1) -> Tuple[Union[None, ConcreteModel], dict]:
+    """
+    Builds the model (and the cost details of each variable) for the data of run_model.
+    The model is None when there are fewer feasible pairs than n_best
+    """
+    # Only feasible combinations become decision variables: seat-incompatible aircraft pairs,
+    # schedules that do not fit and non-existing itineraries are dropped before modeling
+    matrices = RoundTripMatrices(list(data_dict.values()))
+    rows, cols = matrices.feasiblePairs()
+    if len(rows) < n_best:
+        return None, dict()
+    indexes = [matrices.pairIndex(row, col) for row, col in zip(rows, cols)]
 
     """ TO SAVE INFORMATION """
     cost_data = dict()
@@ -54,98 +95,281 @@ def run_model(data: List[ProcessedAircraftData], n_best: int = 1) -> Union[Tuple
     model.bs = pm.Var(indexes, domain=pm.Boolean, initialize=False)
 
     # objetive function
-    def calCostTotal(ac1: str, ac2: str, it_i: int, it_j: int):
-        if it_i >= len(data_dict[ac1].departureItineraryArray) or it_j >= len(data_dict[ac2].returnItineraryArray):
-            # this prevents outside of index
-            return 0
-        if ac1 == 'aircraft0' and ac2 == 'aircraft2' and it_i == 3 and it_j == 0:
-            print('stop')
-        resp = calCostWithDetails(departure_itinerary=data_dict[ac1].departureItineraryArray[it_i],
-                                  return_itinerary=data_dict[ac2].returnItineraryArray[it_j])
-        cost_data[model.bs[ac1, ac2, it_i, it_j].name] = dict(ac1=ac1, ac2=ac2, it_i=it_i, it_j=it_j, resp=resp)
-        return model.bs[ac1, ac2, it_i, it_j] * resp['cost']
-
-    objective = sum(calCostTotal(a1, a2, i, j) for a1, a2, i, j in indexes)
+    def calCostTotal(index: tuple, row: int, col: int):
+        ac1, ac2, it_i, it_j = index
+        resp = matrices.pairDetails(row, col)
+        cost_data[model.bs[index].name] = dict(ac1=ac1, ac2=ac2, it_i=it_i, it_j=it_j, resp=resp)
+        return model.bs[index] * resp['cost']
+
+    objective = sum(calCostTotal(index, row, col) for index, row, col in zip(indexes, rows, cols))
     model.objective = pm.Objective(expr=objective, sense=pm.minimize)
 
     # Constraints:
     # How many best solutions constraint
-    n_solutions = sum(model.bs[a1, a2, i, j] for a1, a2, i, j in indexes) == n_best
+    n_solutions = sum(model.bs[index] for index in indexes) == n_best
     model.n_solutions = pm.Constraint(expr=n_solutions)
 
-    # Only valid combinations allowed
-    def invalidCombination(m, ac1: str, ac2: str, it_i: int, it_j: int):
-        if it_i >= len(data_dict[ac1].departureItineraryArray) or it_j >= len(data_dict[ac2].returnItineraryArray):
-            # This combination does not exist thus this decision variable must be zero
-            return m.bs[ac1, ac2, it_i, it_j] == 0
-        return pm.Constraint.Skip
-
-    model.invalidCombination = pm.Constraint(indexes, rule=invalidCombination)
-
-    # Only feasible round trips
-    def nonFeasibleRoundTrip(m, ac1: str, ac2: str, it_i: int, it_j: int):
-        if it_i < len(data_dict[ac1].departureItineraryArray) and it_j < len(data_dict[ac2].returnItineraryArray):
-            # only for valid indexes:
-            departure_itinerary: ProcessedItinerary = data_dict[ac1].departureItineraryArray[it_i]
-            return_itinerary: ProcessedItinerary = data_dict[ac2].returnItineraryArray[it_j]
-
-            if departure_itinerary.key == return_itinerary.key:
-                # they belong to the same segment: pre + trip + pos should be inside the segment
-                if departure_itinerary.preTripTimeInMin() + return_itinerary.tripPosTimeInMin() > return_itinerary.segmentTimeInMin:
-                    # this schedule does not fit
-                    return m.bs[ac1, ac2, it_i, it_j] == 0
-            elif departure_itinerary.segmentEnd > return_itinerary.segmentStart:
-                # different segments and schedule does not fit since return starts before the departure
-                return m.bs[ac1, ac2, it_i, it_j] == 0
-        # any other case is omitted
-        return pm.Constraint.Skip
-
-    model.nonFeasibleRoundTrip = pm.Constraint(indexes, rule=nonFeasibleRoundTrip)
-
-    # The next trip should have greater or equal number of seats:
-    def nonSeats(m, ac1: str, ac2: str, it_i: int, it_j: int):
-        if it_i < len(data_dict[ac1].departureItineraryArray) and it_j < len(data_dict[ac2].returnItineraryArray):
-            # only for valid indexes:
-            departure_seats = data_dict[ac1].processedAircraft.seats
-            return_seats = data_dict[ac2].processedAircraft.seats
-            if return_seats - departure_seats < 0:
-                # there is no room for other passenger
-                return m.bs[ac1, ac2, it_i, it_j] == 0
-        # any other case is omitted
-        return pm.Constraint.Skip
-
-    model.nonSeats = pm.Constraint(indexes, rule=nonSeats)
-
-    solver = pm.SolverFactory('glpk')
-    solver_results = solver.solve(model)
-    summary = get_final_results(solver_results, model, cost_data, data_dict)
+    return model, cost_data
 
-    return solver_results, model, summary
+
+def templateCapacity(n_pairs: int) -> int:
+    # problems are grouped in shapes of a power of two number of pairs
+    return max(MIN_TEMPLATE_CAPACITY, 1 << (n_pairs - 1).bit_length())
+
+
+class RoundTripModelTemplate:
+    """
+    The model of build_model for up to capacity feasible pairs, with the costs and n_best as mutable Params.
+    It is built once per shape and updated in place for each problem: the pairs that are not used have an
+    upper bound of 0. The template keeps its own solver instances to reuse the structure loaded in the solver
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.n_pairs = 0
+        self.solvers = dict()
+        highs = solverBackends.getSolver(solverBackends.HIGHS_BACKEND, self.solvers)
+        if highs is not None:
+            # the LP relaxation of the model is integral (a single cardinality constraint): the presolve of
+            # HiGHS over the whole template takes longer than the solve itself
+            highs.options['presolve'] = 'off'
+        # a template is used by one problem at a time
+        self.lock = threading.Lock()
+
+        model = pm.ConcreteModel(f'{model_name} (template {capacity})')
+        model.pairs = pm.RangeSet(0, capacity - 1)
+        model.cost = pm.Param(model.pairs, mutable=True, initialize=0.0)
+        model.n_best = pm.Param(mutable=True, initialize=1)
+        model.bs = pm.Var(model.pairs, domain=pm.Boolean, bounds=(0, 0), initialize=False)
+        model.objective = pm.Objective(expr=sum(model.bs[ix] * model.cost[ix] for ix in model.pairs),
+                                       sense=pm.minimize)
+        model.n_solutions = pm.Constraint(expr=sum(model.bs[ix] for ix in model.pairs) == model.n_best)
+        self.model = model
+
+    def update(self, costs: np.ndarray, n_best: int):
+        model = self.model
+        for ix, cost in enumerate(costs.tolist()):
+            model.cost[ix] = cost
+        # only the pairs used by one of the two problems (the previous and this one) change their bounds
+        for ix in range(len(costs), self.n_pairs):
+            model.cost[ix] = 0.0
+            model.bs[ix].setub(0)
+        for ix in range(self.n_pairs, len(costs)):
+            model.bs[ix].setub(1)
+        model.n_best = n_best
+        self.n_pairs = len(costs)
+
+    def selectedPairs(self) -> np.ndarray:
+        # positions (in the costs of update) of the selected pairs
+        bs = self.model.bs
+        return np.array([ix for ix in range(self.n_pairs) if (bs[ix].value or 0) > 0.5], dtype=np.int64)
+
+
+class ModelTemplateCache:
+    """ LRU of the model templates of a process, by capacity """
+
+    def __init__(self, max_size: int = 4):
+        self.max_size = max_size
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, n_pairs: int) -> RoundTripModelTemplate:
+        capacity = templateCapacity(n_pairs)
+        with self._lock:
+            template = self._templates.pop(capacity, None)
+            if template is None:
+                template = RoundTripModelTemplate(capacity)
+            self._templates[capacity] = template
+            while len(self._templates) > self.max_size:
+                self._templates.popitem(last=False)
+            return template
+
+    def capacities(self) -> List[int]:
+        with self._lock:
+            return list(self._templates)
+
+
+def run_template_model(data_dict: dict, n_best: int, solver_backend: str, templates: ModelTemplateCache,
+                       stats: dict = None) -> Union[Tuple[SolverResults, ConcreteModel, list], Tuple[None, None, list]]:
+    """
+    run_model with the template of the shape of the problem instead of a new model. The returned model is the
+    template: it changes with the next problem of the same shape
+    """
+    with timeStage(stats, 'build'):
+        matrices = RoundTripMatrices(list(data_dict.values()))
+        rows, cols = matrices.feasiblePairs()
+    addCount(stats, 'feasible_pairs', len(rows))
+    if len(rows) < n_best:
+        return None, None, [non_successful_answer()]
+
+    with timeStage(stats, 'build'):
+        template = templates.get(len(rows))
+    with template.lock:
+        with timeStage(stats, 'build'):
+            template.update(matrices.cost[rows, cols], n_best)
+        addCount(stats, 'variables', template.capacity)
+        addCount(stats, 'constraints', 1)
+        with timeStage(stats, 'solve'):
+            solver_results = solverBackends.solve(template.model, solver_backend, solvers=template.solvers,
+                                                  warmstart=True)
+        if stats is not None:
+            stats['backend'] = solver_results.solver.backend
+        if not is_valid_solution(solver_results):
+            return solver_results, template.model, [non_successful_answer()]
+        with timeStage(stats, 'extraction'):
+            selected = template.selectedPairs()
+
+    # same order as get_final_results: by price, ties in row-major order
+    with timeStage(stats, 'extraction'):
+        summary = [successful_answer(data_dict, *matrices.pairIndex(row, col), matrices.pairDetails(row, col))
+                   for row, col in zip(rows[selected], cols[selected])]
+        summary.sort(key=lambda x: x.price)
+    return solver_results, template.model, summary
+
+
+def build_pair_model(costs: np.ndarray, n_best: int) -> ConcreteModel:
+    """ The model of build_model restricted to the feasible pairs of an aircraft pair (costs) """
+    model = pm.ConcreteModel(f'{model_name} (aircraft pair)')
+    model.bs = pm.Var(range(len(costs)), domain=pm.Boolean, initialize=False)
+    model.objective = pm.Objective(expr=sum(model.bs[ix] * cost for ix, cost in enumerate(costs.tolist())),
+                                   sense=pm.minimize)
+    model.n_solutions = pm.Constraint(expr=sum(model.bs[ix] for ix in range(len(costs))) == n_best)
+    return model
+
+
+def solve_aircraft_pair(costs: np.ndarray, n_best: int, solver_backend: str = None) -> Optional[np.ndarray]:
+    # positions (in costs) of the n_best selected pairs, None without an optimal solution
+    model = build_pair_model(costs, n_best)
+    solver_results = solverBackends.solve(model, solver_backend)
+    if not is_valid_solution(solver_results):
+        return None
+    return np.array([ix for ix in range(len(costs)) if model.bs[ix].value > 0.5], dtype=np.int64)
+
+
+def run_decomposed_model(data: List[ProcessedAircraftData], n_best: int = 1, solver_backend: str = None,
+                         stats: dict = None) -> Union[None, List[MinCostRoundTripAnswer]]:
+    """
+    run_model split in one subproblem per (departure aircraft, return aircraft) pair. The pairs are only coupled
+    by the cardinality constraint, then the n_best cheapest of the n_best candidates of every subproblem are the
+    optimum of the whole model. The matrices of each aircraft pair are built (and dropped) with its subproblem:
+    the pairs of the whole fleet are never held together. The subproblems are solved one after the other
+    """
+    data_dict = dataToDict(data)
+
+    n_departure = max([len(d.departureItineraryArray) for d in data])
+    n_return = max([len(d.returnItineraryArray) for d in data])
+
+    if n_departure == 0 or n_return == 0:
+        return None
+
+    with timeStage(stats, 'build'):
+        key_ids = dict()
+        departures = {code: ColumnarItineraries([p], 'departureItineraryArray', key_ids)
+                      for code, p in data_dict.items()}
+        returns = {code: ColumnarItineraries([p], 'returnItineraryArray', key_ids) for code, p in data_dict.items()}
+    if stats is not None:
+        # the one the subproblems select
+        stats['backend'] = solverBackends.selectBackend(solver_backend)[0]
+
+    # candidates of the subproblems: (a1 position, i, a2 position, j) and their cost details
+    aircrafts = list(data_dict)
+    candidates, costs, same_or_continuous = list(), list(), list()
+    n_feasible = 0
+    for a1, ac1 in enumerate(aircrafts):
+        for a2, ac2 in enumerate(aircrafts):
+            if len(departures[ac1]) == 0 or len(returns[ac2]) == 0:
+                continue
+            with timeStage(stats, 'build'):
+                matrices = RoundTripMatrices.fromColumns(departures[ac1], returns[ac2])
+                rows, cols = matrices.feasiblePairs()
+                sub_costs = matrices.cost[rows, cols]
+            n_feasible += len(rows)
+            if len(rows) == 0:
+                continue
+            addCount(stats, 'constraints', 1)
+            with timeStage(stats, 'solve'):
+                selection = solve_aircraft_pair(sub_costs, min(n_best, len(rows)), solver_backend)
+            if selection is None:
+                return [non_successful_answer()]
+            rows, cols = rows[selection], cols[selection]
+            candidates.append(np.stack([np.full(len(rows), a1), departures[ac1].itineraryIndex[rows],
+                                        np.full(len(rows), a2), returns[ac2].itineraryIndex[cols]]))
+            costs.append(sub_costs[selection])
+            same_or_continuous.append(matrices.isSameSegmentOrContinuous[rows, cols])
+    addCount(stats, 'feasible_pairs', n_feasible)
+    addCount(stats, 'variables', n_feasible)
+    if n_feasible < n_best:
+        return [non_successful_answer()]
+
+    # merge: ties are kept in row-major order of the whole fleet as in run_direct_model
+    with timeStage(stats, 'extraction'):
+        a1, it_i, a2, it_j = np.concatenate(candidates, axis=1)
+        costs, same_or_continuous = np.concatenate(costs), np.concatenate(same_or_continuous)
+        best = np.lexsort((it_j, a2, it_i, a1, costs))[:n_best]
+        return [successful_answer(data_dict, aircrafts[a1[ix]], aircrafts[a2[ix]], int(it_i[ix]), int(it_j[ix]),
+                                  dict(cost=float(costs[ix]), isSameSegmentOrContinuous=bool(same_or_continuous[ix])))
+                for ix in best]
+
+
+def run_direct_model(data: List[ProcessedAircraftData], n_best: int = 1,
+                     stats: dict = None) -> Union[None, List[MinCostRoundTripAnswer]]:
+    """
+    Solver-free version of run_model: the model only selects the n_best cheapest feasible pairs
+    subject to the cardinality constraint, therefore a top-k selection over the pair costs is exact
+    """
+    data_dict = dataToDict(data)
+
+    n_departure = max([len(d.departureItineraryArray) for d in data])
+    n_return = max([len(d.returnItineraryArray) for d in data])
+
+    if n_departure == 0 or n_return == 0:
+        return None
+
+    with timeStage(stats, 'build'):
+        matrices = RoundTripMatrices(list(data_dict.values()))
+        n_feasible = int(matrices.feasible.sum())
+    addCount(stats, 'feasible_pairs', n_feasible)
+    if n_feasible < n_best:
+        return [non_successful_answer()]
+
+    with timeStage(stats, 'solve'):
+        rows, cols = matrices.bestPairs(n_best)
+    with timeStage(stats, 'extraction'):
+        return [successful_answer(data_dict, *matrices.pairIndex(row, col), matrices.pairDetails(row, col))
+                for row, col in zip(rows, cols)]
+
+
+def successful_answer(data_dict: dict, ac1: str, ac2: str, it_i: int, it_j: int, resp: dict) -> MinCostRoundTripAnswer:
+    answer = MinCostRoundTripAnswer()
+    answer.isSuccess = True
+    answer.msg = SUCCESSFUL_SOLVER_SOLUTION_MSG
+    answer.departurePath = data_dict[ac1].departureItineraryArray[it_i]
+    answer.returnPath = data_dict[ac2].returnItineraryArray[it_j]
+    answer.departureAircraft = ac1
+    answer.returnAircraft = ac2
+    answer.price = resp['cost']
+    answer.isSameSegmentOrContinuous = resp['isSameSegmentOrContinuous']
+    return answer
+
+
+def non_successful_answer() -> MinCostRoundTripAnswer:
+    answer = MinCostRoundTripAnswer()
+    answer.isSuccess = False
+    answer.msg = NON_SUCCESSFUL_SOLVER_SOLUTION_MSG
+    return answer
 
 
 def get_final_results(solver_results, model, cost_data, data_dict) -> List[MinCostRoundTripAnswer]:
     resp = list()
     success = is_valid_solution(solver_results)
     if not success:
-        answer = MinCostRoundTripAnswer()
-        answer.isSuccess = success
-        answer.msg = NON_SUCCESSFUL_SOLVER_SOLUTION_MSG
-        return [answer]
+        return [non_successful_answer()]
 
     if success:
         for v in model.component_data_objects(pm.Var):
             if v.domain == pm.Boolean and v.value > 0:
                 v_dict = cost_data[v.name]
                 ac1, it_i, ac2, it_j = v_dict['ac1'], v_dict['it_i'], v_dict['ac2'], v_dict['it_j']
-                answer = MinCostRoundTripAnswer()
-                answer.isSuccess = success
-                answer.msg = SUCCESSFUL_SOLVER_SOLUTION_MSG
-                answer.departurePath = data_dict[ac1].departureItineraryArray[it_i]
-                answer.returnPath = data_dict[ac2].returnItineraryArray[it_j]
-                answer.departureAircraft = ac1
-                answer.returnAircraft = ac2
-                answer.price = v_dict['resp']['cost']
-                answer.isSameSegmentOrContinuous = v_dict['resp']['isSameSegmentOrContinuous']
-                resp.append(answer)
+                resp.append(successful_answer(data_dict, ac1, ac2, it_i, it_j, v_dict['resp']))
         resp.sort(key=lambda x: x.price)
     return resp
@@ -0,0 +1,172 @@
+from typing import List
+
+import numpy as np
+
+from modeling.classes.ProcessedAircraftData import ProcessedAircraftData
+
+
+class ColumnarItineraries:
+    """
+    Column arrays for all the departure (or return) itineraries of a fleet, one row per itinerary
+    in aircraft order and then itinerary order
+    """
+    aircraftIndex: np.ndarray
+    itineraryIndex: np.ndarray
+    keyId: np.ndarray
+    seats: np.ndarray
+    prePrice: np.ndarray
+    tripPrice: np.ndarray
+    posPrice: np.ndarray
+    preTime: np.ndarray
+    tripTime: np.ndarray
+    posTime: np.ndarray
+    segmentStart: np.ndarray
+    segmentEnd: np.ndarray
+    segmentTime: np.ndarray
+    nextKeyOffsets: np.ndarray
+    nextKeyIndex: np.ndarray
+
+    def __init__(self, data: List[ProcessedAircraftData], array_name: str, key_ids: dict):
+        rows = [(ac_ix, it_ix, itinerary, p.processedAircraft.seats)
+                for ac_ix, p in enumerate(data)
+                for it_ix, itinerary in enumerate(getattr(p, array_name))]
+
+        def column(values, dtype=np.float64):
+            return np.fromiter(values, dtype=dtype, count=len(rows))
+
+        self.aircraftIndex = column((r[0] for r in rows), np.int64)
+        self.itineraryIndex = column((r[1] for r in rows), np.int64)
+        self.keyId = column((key_ids.setdefault(r[2].key, len(key_ids)) for r in rows), np.int64)
+        self.seats = column((r[3] for r in rows), np.int64)
+        self.prePrice = column(r[2].preReposition.price for r in rows)
+        self.tripPrice = column(r[2].trip.price for r in rows)
+        self.posPrice = column(r[2].posReposition.price for r in rows)
+        self.preTime = column(r[2].preReposition.timeInMin for r in rows)
+        self.tripTime = column(r[2].trip.timeInMin for r in rows)
+        self.posTime = column(r[2].posReposition.timeInMin for r in rows)
+        self.segmentStart = column(r[2].segmentStart for r in rows)
+        self.segmentEnd = column(r[2].segmentEnd for r in rows)
+        self.segmentTime = column(np.nan if r[2].segmentTimeInMin is None else r[2].segmentTimeInMin for r in rows)
+        # sparse (CSR) adjacency of the next possible segments: the key ids of row i are
+        # nextKeyIndex[nextKeyOffsets[i]:nextKeyOffsets[i + 1]]
+        self.nextKeyOffsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(column((len(r[2].nextPossibleSegments) for r in rows), np.int64), out=self.nextKeyOffsets[1:])
+        self.nextKeyIndex = np.fromiter((key_ids.setdefault(k, len(key_ids))
+                                         for r in rows for k in r[2].nextPossibleSegments),
+                                        dtype=np.int64, count=self.nextKeyOffsets[-1])
+
+    def __len__(self):
+        return len(self.aircraftIndex)
+
+    # same additions (and order) as the ProcessedItinerary methods:
+    def preTripPrice(self):
+        return self.prePrice + self.tripPrice
+
+    def tripPosPrice(self):
+        return self.tripPrice + self.posPrice
+
+    def preTripPosPrice(self):
+        return self.prePrice + self.tripPrice + self.posPrice
+
+    def preTripTimeInMin(self):
+        return self.preTime + self.tripTime
+
+    def tripPosTimeInMin(self):
+        return self.tripTime + self.posTime
+
+
+class RoundTripMatrices:
+    """
+    Cost and feasibility of every (departure, return) pair of a fleet: rows are the departure
+    itineraries and columns the return itineraries of ColumnarItineraries
+    """
+    aircrafts: List[str]
+    departures: ColumnarItineraries
+    returns: ColumnarItineraries
+    cost: np.ndarray
+    isSameSegmentOrContinuous: np.ndarray
+    feasible: np.ndarray
+
+    def __init__(self, data: List[ProcessedAircraftData]):
+        key_ids = dict()
+        self.setColumns([p.processedAircraft.aircraftCode for p in data],
+                        ColumnarItineraries(data, 'departureItineraryArray', key_ids),
+                        ColumnarItineraries(data, 'returnItineraryArray', key_ids))
+
+    @classmethod
+    def fromColumns(cls, departures: ColumnarItineraries, returns: ColumnarItineraries, aircrafts: List[str] = None):
+        # matrices of columns built elsewhere (their key ids must come from the same interning dict).
+        # Without aircrafts pairIndex is not available
+        matrices = cls.__new__(cls)
+        matrices.setColumns(aircrafts, departures, returns)
+        return matrices
+
+    def setColumns(self, aircrafts: List[str], departures: ColumnarItineraries, returns: ColumnarItineraries):
+        self.aircrafts = aircrafts
+        self.departures = departures
+        self.returns = returns
+        self.isSameSegmentOrContinuous = self.calSameSegmentOrContinuous()
+        self.cost = self.calCost()
+        self.feasible = self.calFeasibility()
+
+    def calSameSegmentOrContinuous(self) -> np.ndarray:
+        dep, ret = self.departures, self.returns
+        same_or_continuous = dep.keyId[:, None] == ret.keyId[None, :]
+        # continuity: the return key is one of the next possible segments of the departure. Each
+        # (departure row, next key) edge of the adjacency marks the return columns with that key
+        edge_rows = np.repeat(np.arange(len(dep)), np.diff(dep.nextKeyOffsets))
+        columns_by_key = np.argsort(ret.keyId, kind='stable')
+        sorted_keys = ret.keyId[columns_by_key]
+        first = np.searchsorted(sorted_keys, dep.nextKeyIndex, side='left')
+        n_columns = np.searchsorted(sorted_keys, dep.nextKeyIndex, side='right') - first
+        # positions first[e], first[e] + 1, ..., first[e] + n_columns[e] - 1 of every edge e
+        edge_of_position = np.repeat(np.arange(len(first)), n_columns)
+        positions = np.arange(len(edge_of_position)) - np.repeat(np.cumsum(n_columns) - n_columns, n_columns)
+        same_or_continuous[edge_rows[edge_of_position], columns_by_key[first[edge_of_position] + positions]] = True
+        return same_or_continuous
+
+    def calCost(self) -> np.ndarray:
+        dep, ret = self.departures, self.returns
+        # same segment or continuous segments (the return key is a next possible segment of the departure):
+        # x->e, e->f, f->y | y->f, f->e, e->z is simplified to x->e, e->f | f->e, e->z
+        return np.where(self.isSameSegmentOrContinuous,
+                        dep.preTripPrice()[:, None] + ret.tripPosPrice()[None, :],
+                        dep.preTripPosPrice()[:, None] + ret.preTripPosPrice()[None, :])
+
+    def calFeasibility(self) -> np.ndarray:
+        dep, ret = self.departures, self.returns
+        # The next trip should have greater or equal number of seats:
+        enough_seats = ret.seats[None, :] >= dep.seats[:, None]
+        # same segment: pre + trip + pos should be inside the segment,
+        # different segments: the return cannot start before the departure ends
+        fits_same_segment = (dep.preTripTimeInMin()[:, None] + ret.tripPosTimeInMin()[None, :]
+                             <= ret.segmentTime[None, :])
+        fits_different_segments = dep.segmentEnd[:, None] <= ret.segmentStart[None, :]
+        same_key = dep.keyId[:, None] == ret.keyId[None, :]
+        return enough_seats & np.where(same_key, fits_same_segment, fits_different_segments)
+
+    def feasiblePairs(self):
+        # (departure row, return column) of the feasible pairs in row-major order
+        return np.nonzero(self.feasible)
+
+    def bestPairs(self, n_best: int):
+        """ the n_best cheapest feasible pairs, ties are kept in row-major order """
+        rows, cols = self.feasiblePairs()
+        costs = self.cost[rows, cols]
+        if n_best < len(costs):
+            kth_cost = np.partition(costs, n_best - 1)[n_best - 1]
+            candidates = np.flatnonzero(costs <= kth_cost)
+        else:
+            candidates = np.arange(len(costs))
+        best = candidates[np.argsort(costs[candidates], kind='stable')][:n_best]
+        return rows[best], cols[best]
+
+    def pairIndex(self, row: int, col: int):
+        # (a1, a2, i, j) index of the model for a (departure row, return column) pair
+        return (self.aircrafts[self.departures.aircraftIndex[row]], self.aircrafts[self.returns.aircraftIndex[col]],
+                int(self.departures.itineraryIndex[row]), int(self.returns.itineraryIndex[col]))
+
+    def pairDetails(self, row: int, col: int) -> dict:
+        # cost details of a pair in the answers
+        return dict(cost=float(self.cost[row, col]),
+                    isSameSegmentOrContinuous=bool(self.isSameSegmentOrContinuous[row, col]))
@@ -0,0 +1,113 @@
+from typing import List, Union
+
+import numpy as np
+
+from modeling.classes.ProcessedAircraftData import ProcessedAircraftData
+from modeling.models.minCostRoundTripAnswer import MinCostRoundTripAnswer
+from modeling.models.minCostRoundTripModel import successful_answer, non_successful_answer
+from modeling.models.roundTripMatrices import ColumnarItineraries, RoundTripMatrices
+
+
+class RoundTripSession:
+    """
+    Round trip problem kept between requests to answer what-if changes of the calendar of one aircraft.
+    The n_best cheapest feasible pairs of every (departure aircraft, return aircraft) block are cached:
+    a change only recomputes the row and the column of blocks of its aircraft, and the answer is the
+    top-k of the cached candidates (the same answers as run_direct_model over the whole fleet)
+    """
+
+    def __init__(self, data: List[ProcessedAircraftData], n_best: int = 1):
+        self.n_best = n_best
+        self.keyIds = dict()
+        self.data_dict = dict()
+        self.departures = dict()
+        self.returns = dict()
+        # position of each aircraft in the candidate arrays, in arrival order (as dataToDict)
+        self.positions = dict()
+        # candidates of the block (a1, a2) are [a1, a2, :], completed with an infinite cost. The depth is the
+        # largest number of candidates of a block: at most n_best, and at most the feasible pairs of the block
+        self.cost = np.full((0, 0, 0), np.inf)
+        self.isSameSegmentOrContinuous = np.zeros((0, 0, 0), dtype=bool)
+        self.departureIndex = np.full((0, 0, 0), -1, dtype=np.int64)
+        self.returnIndex = np.full((0, 0, 0), -1, dtype=np.int64)
+
+        for aircraft_data in data:
+            self.setColumns(aircraft_data)
+        self.grow()
+        for ac1 in self.positions:
+            for ac2 in self.positions:
+                self.calBlock(ac1, ac2)
+
+    @property
+    def aircrafts(self) -> List[str]:
+        return list(self.positions)
+
+    def setColumns(self, aircraft_data: ProcessedAircraftData):
+        code = aircraft_data.processedAircraft.aircraftCode
+        self.positions.setdefault(code, len(self.positions))
+        self.data_dict[code] = aircraft_data
+        self.departures[code] = ColumnarItineraries([aircraft_data], 'departureItineraryArray', self.keyIds)
+        self.returns[code] = ColumnarItineraries([aircraft_data], 'returnItineraryArray', self.keyIds)
+
+    def grow(self, depth: int = 0):
+        # room for the aircraft added since the last call and for depth candidates per block
+        n_new = len(self.positions) - self.cost.shape[0]
+        n_deeper = depth - self.cost.shape[2]
+        if n_new <= 0 and n_deeper <= 0:
+            return
+        pad = ((0, max(n_new, 0)), (0, max(n_new, 0)), (0, max(n_deeper, 0)))
+        self.cost = np.pad(self.cost, pad, constant_values=np.inf)
+        self.isSameSegmentOrContinuous = np.pad(self.isSameSegmentOrContinuous, pad, constant_values=False)
+        self.departureIndex = np.pad(self.departureIndex, pad, constant_values=-1)
+        self.returnIndex = np.pad(self.returnIndex, pad, constant_values=-1)
+
+    def calBlock(self, ac1: str, ac2: str):
+        departures, returns = self.departures[ac1], self.returns[ac2]
+        position = self.positions[ac1], self.positions[ac2]
+        self.cost[position] = np.inf
+        self.isSameSegmentOrContinuous[position] = False
+        self.departureIndex[position] = -1
+        self.returnIndex[position] = -1
+        if len(departures) == 0 or len(returns) == 0:
+            return
+        matrices = RoundTripMatrices.fromColumns(departures, returns)
+        rows, cols = matrices.bestPairs(self.n_best)
+        n_candidates = len(rows)
+        self.grow(n_candidates)
+        self.cost[position][:n_candidates] = matrices.cost[rows, cols]
+        self.isSameSegmentOrContinuous[position][:n_candidates] = matrices.isSameSegmentOrContinuous[rows, cols]
+        self.departureIndex[position][:n_candidates] = departures.itineraryIndex[rows]
+        self.returnIndex[position][:n_candidates] = returns.itineraryIndex[cols]
+
+    def setAircraft(self, aircraft_data: ProcessedAircraftData):
+        """ adds or replaces the calendar of an aircraft, only its row and column of blocks are recomputed """
+        self.setColumns(aircraft_data)
+        self.grow()
+        code = aircraft_data.processedAircraft.aircraftCode
+        for other in self.positions:
+            self.calBlock(code, other)
+            if other != code:
+                self.calBlock(other, code)
+
+    def bestAnswers(self) -> Union[None, List[MinCostRoundTripAnswer]]:
+        if all(len(d) == 0 for d in self.departures.values()) or all(len(r) == 0 for r in self.returns.values()):
+            return None
+
+        costs = self.cost.ravel()
+        finite = np.flatnonzero(np.isfinite(costs))
+        if len(finite) < self.n_best:
+            return [non_successful_answer()]
+        if self.n_best < len(finite):
+            kth_cost = np.partition(costs[finite], self.n_best - 1)[self.n_best - 1]
+            finite = finite[costs[finite] <= kth_cost]
+
+        # ties are kept in row-major order of the whole fleet as in run_direct_model
+        a1, a2, _ = np.unravel_index(finite, self.cost.shape)
+        it_i, it_j = self.departureIndex.ravel()[finite], self.returnIndex.ravel()[finite]
+        best = np.lexsort((it_j, a2, it_i, a1, costs[finite]))[:self.n_best]
+        aircrafts = self.aircrafts
+        return [successful_answer(self.data_dict, aircrafts[a1[ix]], aircrafts[a2[ix]], int(it_i[ix]), int(it_j[ix]),
+                                  dict(cost=float(costs[finite[ix]]),
+                                       isSameSegmentOrContinuous=bool(
+                                           self.isSameSegmentOrContinuous.ravel()[finite[ix]])))
+                for ix in best]
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from modeling.models.utils import pm
+
+if TYPE_CHECKING:
+    from pyomo.core import ConcreteModel
+    from pyomo.opt import SolverResults
+
+log = logging.getLogger(__name__)
+
+# in-process HiGHS interface (highspy bindings): no LP file, no subprocess and no solution file
+HIGHS_BACKEND = 'appsi_highs'
+# GLPK through glpsol: always kept as the fallback
+GLPK_BACKEND = 'glpk'
+
+# preference order when no backend is requested
+DEFAULT_BACKENDS = [HIGHS_BACKEND, GLPK_BACKEND]
+
+# solver instances are not thread safe, then each worker thread keeps (and reuses) its own instances
+_solvers = threading.local()
+
+
+def quietHighs(solver):
+    """
+    Turns off the output of HiGHS (banner and log) in the server processes. HiGHS prints its banner at the first
+    change of a new highspy model, before the options of the solve are applied: output_flag is set as soon as
+    set_instance creates the highspy model of a new Pyomo model
+    """
+    solver.highs_options['output_flag'] = False
+    add_block = solver.add_block
+
+    def quiet_add_block(block):
+        solver._solver_model.setOptionValue('output_flag', False)
+        add_block(block)
+
+    solver.add_block = quiet_add_block
+    return solver
+
+
+def getSolver(backend: str, solvers: dict = None):
+    # solvers: instances of a single model (e.g. a template, used by a thread at a time) instead of the thread ones
+    solvers = _solvers.__dict__.setdefault('solvers', dict()) if solvers is None else solvers
+    if backend not in solvers:
+        solver = pm.SolverFactory(backend)
+        if not solver.available(exception_flag=False):
+            solver = None
+        elif backend == HIGHS_BACKEND:
+            solver = quietHighs(solver)
+        solvers[backend] = solver
+    return solvers[backend]
+
+
+def isWarmStartCapable(solver) -> bool:
+    # the persistent (appsi) interfaces do not have warm_start_capable
+    return hasattr(solver, 'warm_start_capable') and solver.warm_start_capable()
+
+
+def selectBackend(backend: str = None, solvers: dict = None):
+    """
+    Returns (name, solver) for the requested backend, or for the first available backend in
+    DEFAULT_BACKENDS when it is not given. GLPK is used as fallback when the requested one is not available
+    """
+    candidates = [backend, GLPK_BACKEND] if backend else DEFAULT_BACKENDS
+    for name in candidates:
+        solver = getSolver(name, solvers)
+        if solver is not None:
+            if backend and name != backend:
+                log.warning(f"Solver backend '{backend}' is not available, using '{name}' instead")
+            return name, solver
+    # nothing available: let GLPK raise its usual error
+    return GLPK_BACKEND, pm.SolverFactory(GLPK_BACKEND)
+
+
+def solve(model: ConcreteModel, backend: str = None, solvers: dict = None, warmstart: bool = False) -> SolverResults:
+    """
+    Solves the model with the backend of selectBackend. A model solved again with its own solvers dict keeps its
+    solver instance: the persistent interfaces (appsi_highs) only load the changes since the previous solve.
+    With warmstart the current values of the variables are the initial solution, when the backend supports it
+    """
+    name, solver = selectBackend(backend, solvers)
+    start = time.perf_counter()
+    if warmstart and isWarmStartCapable(solver):
+        solver_results = solver.solve(model, warmstart=True)
+    else:
+        solver_results = solver.solve(model)
+    elapsed = time.perf_counter() - start
+    # record which backend solved the model and how long it took:
+    solver_results.solver.backend = name
+    solver_results.solver.wallclock_time = elapsed
+    log.info(f"{model.name} solved with '{name}' in {elapsed:.4f} s "
+             f"[{solver_results.solver.termination_condition}]")
+    return solver_results
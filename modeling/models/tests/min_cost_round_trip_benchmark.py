@@ -0,0 +1,216 @@
+"""
+Benchmark of the round trip optimizer over a grid of problem sizes.
+
+Data generation, model build, solve and result extraction are timed separately, and the peak memory
+(tracemalloc) of build + solve + extraction is measured in an extra run. Results are written as JSON and CSV
+so they can be compared between commits:
+
+    python -m modeling.models.tests.min_cost_round_trip_benchmark --aircrafts 3,5,10 --airports 5,10 --days 5,10
+    python -m modeling.models.tests.min_cost_round_trip_benchmark --compare benchmark_results/<previous>.json
+"""
+import argparse
+import csv
+import datetime as dt
+import json
+import os
+import subprocess
+import time
+import tracemalloc
+from itertools import product
+
+from modeling.classes.ItineraryGenerator import ItineraryGenerator
+from modeling.models import minCostRoundTripModel, solverBackends
+from modeling.models.roundTripMatrices import RoundTripMatrices
+from modeling.models.utils import generateAircraftsAndAirports, dataToDict
+
+STAGES = ['generation', 'build', 'solve', 'extraction']
+
+
+def generateStudyCase(n_aircrafts, n_airports, n_days, seed):
+    aircrafts, airport_names = generateAircraftsAndAirports(n_aircrafts, n_airports, seed=seed)
+    itinerary_gen = ItineraryGenerator(aircrafts=aircrafts, airport_names=airport_names, n_days=n_days,
+                                       start_hour=dt.timedelta(hours=6), end_hour=dt.timedelta(hours=20), seed=seed)
+    return itinerary_gen.generateStudyCaseRoundTrip(from_airport=airport_names[1 % n_airports],
+                                                    to_airport=airport_names[3 % n_airports])
+
+
+def runMilp(study_case, n_best, solver_backend, times: dict):
+    start = time.perf_counter()
+    data_dict = dataToDict(study_case)
+    model, cost_data = minCostRoundTripModel.build_model(data_dict, n_best)
+    times['build'] = time.perf_counter() - start
+    if model is None:
+        return dict(variables=0)
+
+    start = time.perf_counter()
+    solver_results = solverBackends.solve(model, solver_backend)
+    times['solve'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary = minCostRoundTripModel.get_final_results(solver_results, model, cost_data, data_dict)
+    times['extraction'] = time.perf_counter() - start
+    return dict(variables=model.nvariables(), backend=solver_results.solver.backend, best_price=summary[0].price)
+
+
+# templates of the milp_template runs: the first repetition builds the template, the others reuse it
+model_templates = minCostRoundTripModel.ModelTemplateCache()
+
+
+def runMilpTemplate(study_case, n_best, solver_backend, times: dict):
+    start = time.perf_counter()
+    data_dict = dataToDict(study_case)
+    matrices = RoundTripMatrices(list(data_dict.values()))
+    rows, cols = matrices.feasiblePairs()
+    if len(rows) < n_best:
+        return dict(variables=0)
+    template = model_templates.get(len(rows))
+    template.update(matrices.cost[rows, cols], n_best)
+    times['build'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    solver_results = solverBackends.solve(template.model, solver_backend, solvers=template.solvers, warmstart=True)
+    times['solve'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    selected = template.selectedPairs()
+    summary = sorted((minCostRoundTripModel.successful_answer(data_dict, *matrices.pairIndex(row, col),
+                                                              matrices.pairDetails(row, col))
+                      for row, col in zip(rows[selected], cols[selected])), key=lambda x: x.price)
+    times['extraction'] = time.perf_counter() - start
+    return dict(variables=template.model.nvariables(), backend=solver_results.solver.backend,
+                best_price=summary[0].price)
+
+
+def runDirect(study_case, n_best, solver_backend, times: dict):
+    start = time.perf_counter()
+    data_dict = dataToDict(study_case)
+    matrices = RoundTripMatrices(list(data_dict.values()))
+    times['build'] = time.perf_counter() - start
+    if matrices.feasible.sum() < n_best:
+        return dict(variables=0)
+
+    start = time.perf_counter()
+    rows, cols = matrices.bestPairs(n_best)
+    times['solve'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary = [minCostRoundTripModel.successful_answer(data_dict, *matrices.pairIndex(row, col),
+                                                       matrices.pairDetails(row, col)) for row, col in zip(rows, cols)]
+    times['extraction'] = time.perf_counter() - start
+    return dict(variables=0, backend='direct', best_price=summary[0].price)
+
+
+def runDecomposed(study_case, n_best, solver_backend, times: dict):
+    # build, subproblem solves and merge are interleaved: everything is timed as solve
+    start = time.perf_counter()
+    summary = minCostRoundTripModel.run_decomposed_model(study_case, n_best=n_best, solver_backend=solver_backend)
+    times['solve'] = time.perf_counter() - start
+    return dict(variables=0, backend='decomposed', best_price=summary[0].price)
+
+
+ENGINES = {minCostRoundTripModel.MILP_ENGINE: runMilp, 'milp_template': runMilpTemplate,
+           minCostRoundTripModel.DIRECT_ENGINE: runDirect, minCostRoundTripModel.DECOMPOSED_ENGINE: runDecomposed}
+
+
+def benchmarkCase(engine, n_aircrafts, n_airports, n_days, n_best, seed, solver_backend, repeat):
+    times = {stage: [] for stage in STAGES}
+    details = dict()
+    for _ in range(repeat):
+        run_times = dict.fromkeys(STAGES, 0.0)
+        start = time.perf_counter()
+        study_case = generateStudyCase(n_aircrafts, n_airports, n_days, seed)
+        run_times['generation'] = time.perf_counter() - start
+        details = ENGINES[engine](study_case, n_best, solver_backend, run_times)
+        for stage in STAGES:
+            times[stage].append(run_times[stage])
+
+    # peak memory in a separated run: tracemalloc slows down the execution
+    tracemalloc.start()
+    ENGINES[engine](study_case, n_best, solver_backend, dict())
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    matrices = RoundTripMatrices(list(dataToDict(study_case).values()))
+    result = dict(engine=engine, aircrafts=n_aircrafts, airports=n_airports, days=n_days, n_best=n_best, seed=seed,
+                  departures=len(matrices.departures), returns=len(matrices.returns),
+                  feasible_pairs=int(matrices.feasible.sum()), peak_memory_mb=round(peak_memory / 2 ** 20, 3))
+    result.update(details)
+    for stage in STAGES:
+        # best of the repetitions is the less noisy estimation
+        result[f'{stage}_s'] = round(min(times[stage]), 6)
+    result['total_s'] = round(sum(result[f'{stage}_s'] for stage in STAGES), 6)
+    return result
+
+
+def gitCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def caseKey(result: dict):
+    return result['engine'], result['aircrafts'], result['airports'], result['days'], result['n_best']
+
+
+def compare(results: list, previous_file: str):
+    with open(previous_file) as f:
+        previous = {caseKey(r): r for r in json.load(f)['results']}
+    print(f'# ==========================================================\nComparison against {previous_file}')
+    for result in results:
+        other = previous.get(caseKey(result))
+        if other is None:
+            continue
+        ratios = ' '.join(f'{stage}: x{other[f"{stage}_s"] / result[f"{stage}_s"]:.2f}'
+                          for stage in STAGES + ['total'] if result[f'{stage}_s'] > 0)
+        print(f'{caseKey(result)} speed-up {ratios}')
+
+
+def parseIntList(value: str):
+    return [int(v) for v in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round trip optimizer benchmark')
+    parser.add_argument('--aircrafts', type=parseIntList, default=[3, 5, 10])
+    parser.add_argument('--airports', type=parseIntList, default=[5, 10])
+    parser.add_argument('--days', type=parseIntList, default=[5, 10, 20])
+    parser.add_argument('--n-best', type=parseIntList, default=[1])
+    parser.add_argument('--engines', type=lambda v: v.split(','), default=list(ENGINES.keys()))
+    parser.add_argument('--solver-backend', default=None)
+    parser.add_argument('--seed', type=int, default=77)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output-dir', default='benchmark_results')
+    parser.add_argument('--compare', default=None, help='previous JSON results to compare with')
+    args = parser.parse_args()
+
+    results = list()
+    for engine, n_aircrafts, n_airports, n_days, n_best in product(args.engines, args.aircrafts, args.airports,
+                                                                   args.days, args.n_best):
+        result = benchmarkCase(engine, n_aircrafts, n_airports, n_days, n_best, args.seed, args.solver_backend,
+                               args.repeat)
+        results.append(result)
+        print(f"{engine:>6} ({n_aircrafts} aircrafts, {n_airports} airports, {n_days} days, n_best={n_best}): "
+              f"{result['feasible_pairs']} feasible pairs | " +
+              ' '.join(f"{stage}: {result[f'{stage}_s']:.4f}s" for stage in STAGES) +
+              f" | peak memory: {result['peak_memory_mb']} MB")
+
+    commit = gitCommit()
+    os.makedirs(args.output_dir, exist_ok=True)
+    file_name = os.path.join(args.output_dir, f"round_trip_{commit}_{dt.datetime.now():%Y%m%d_%H%M%S}")
+    with open(f'{file_name}.json', 'w') as f:
+        json.dump(dict(commit=commit, date=f'{dt.datetime.now().isoformat()}', args=vars(args), results=results), f,
+                  indent=2, default=str)
+    with open(f'{file_name}.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(dict.fromkeys(k for r in results for k in r)))
+        writer.writeheader()
+        writer.writerows(results)
+    print(f'Results saved in {file_name}.json and {file_name}.csv')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import datetime as dt
+
+from modeling.classes.ItineraryGenerator import ItineraryGenerator
+from modeling.models import minCostRoundTripModel
+from modeling.models.utils import generateAircraftsAndAirports
+
+# (n_aircrafts, n_airports, n_days, seed)
+study_cases = [(3, 5, 5, 77), (4, 6, 7, 11), (5, 5, 6, 3), (6, 8, 10, 21)]
+n_best_values = [1, 4, 10]
+
+
+def generateStudyCase(n_aircrafts, n_airports, n_days, seed):
+    aircrafts, airport_names = generateAircraftsAndAirports(n_aircrafts, n_airports, seed=seed)
+    itinerary_gen = ItineraryGenerator(aircrafts=aircrafts, airport_names=airport_names, n_days=n_days,
+                                       start_hour=dt.timedelta(hours=6), end_hour=dt.timedelta(hours=20), seed=seed)
+    return itinerary_gen.generateStudyCaseRoundTrip(from_airport='airport1', to_airport='airport3')
+
+
+def summaryPrices(summary_list):
+    # Different pairs with the same cost are equally optimal, therefore only the ranked costs are compared
+    return [(answer.isSuccess, answer.price) for answer in summary_list]
+
+
+def test():
+    n_errors = 0
+    # one cache for all the cases: the templates are reused by problems of different sizes
+    templates = minCostRoundTripModel.ModelTemplateCache()
+    for n_aircrafts, n_airports, n_days, seed in study_cases:
+        study_case = generateStudyCase(n_aircrafts, n_airports, n_days, seed)
+        for n_best in n_best_values:
+            solver_results, model, milp_summary = minCostRoundTripModel.run_model(study_case, n_best=n_best)
+            direct_summary = minCostRoundTripModel.run_direct_model(study_case, n_best=n_best)
+            _, _, decomposed_summary = minCostRoundTripModel.run_model(study_case, n_best=n_best, decomposed=True)
+            _, _, template_summary = minCostRoundTripModel.run_model(study_case, n_best=n_best, templates=templates)
+            is_equal = summaryPrices(milp_summary) == summaryPrices(direct_summary) == \
+                summaryPrices(decomposed_summary) == summaryPrices(template_summary)
+            n_errors += 0 if is_equal else 1
+            print(f'({n_aircrafts} aircrafts, {n_airports} airports, {n_days} days, seed {seed}) '
+                  f'n_best={n_best}: {"OK" if is_equal else "DIFFERENT"}')
+            if not is_equal:
+                print(f'\tMILP:   {summaryPrices(milp_summary)}')
+                print(f'\tdirect: {summaryPrices(direct_summary)}')
+                print(f'\tdecomposed: {summaryPrices(decomposed_summary)}')
+                print(f'\ttemplate: {summaryPrices(template_summary)}')
+
+    print(f'# ==========================================================\n{n_errors} differences found')
+
+
+if __name__ == "__main__":
+    test()
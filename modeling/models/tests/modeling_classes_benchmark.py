@@ -0,0 +1,100 @@
+"""
+Memory and construction time of the modeling classes (__slots__) against the previous dict based layout,
+when a validated request (CalendarInformationSC) is converted to ProcessedAircraftData objects:
+
+    python -m modeling.models.tests.modeling_classes_benchmark --aircrafts 50 --days 180
+"""
+import argparse
+import datetime as dt
+import time
+import tracemalloc
+
+from app.schemas.GLPKSchema import CalendarInformationSC
+from modeling.classes.ItineraryGenerator import ItineraryGenerator
+from modeling.classes.ProcessedAircraftData import ProcessedAircraftData
+from modeling.models.utils import generateAircraftsAndAirports
+
+
+# previous layout: per instance __dict__ filled by a setattr loop
+class LegacyFlight:
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+
+class LegacyProcessedItinerary:
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+        self.preReposition = LegacyFlight(**self.preReposition)
+        self.trip = LegacyFlight(**self.trip)
+        self.posReposition = LegacyFlight(**self.posReposition)
+        self.segmentTimeInMin = self.segmentEnd - self.segmentStart
+
+
+class LegacyAircraft:
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+
+class LegacyProcessedAircraftData:
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+        self.departureItineraryArray = [LegacyProcessedItinerary(**d) for d in self.departureItineraryArray]
+        self.returnItineraryArray = [LegacyProcessedItinerary(**d) for d in self.returnItineraryArray]
+        self.processedAircraft = LegacyAircraft(**self.processedAircraft)
+
+
+LAYOUTS = {'legacy': lambda p: LegacyProcessedAircraftData(**p), 'slots': ProcessedAircraftData.from_dict}
+
+
+def measure(build, aircraft_data: list, repeat: int):
+    best_time = min(timed(build, aircraft_data) for _ in range(repeat))
+    tracemalloc.start()
+    objects = [build(p) for p in aircraft_data]
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return best_time, memory
+
+
+def timed(build, aircraft_data: list):
+    start = time.perf_counter()
+    [build(p) for p in aircraft_data]
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Modeling classes memory and construction benchmark')
+    parser.add_argument('--aircrafts', type=int, default=20)
+    parser.add_argument('--airports', type=int, default=10)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--seed', type=int, default=77)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    aircrafts, airport_names = generateAircraftsAndAirports(args.aircrafts, args.airports, seed=args.seed)
+    itinerary_gen = ItineraryGenerator(aircrafts=aircrafts, airport_names=airport_names, n_days=args.days,
+                                       start_hour=dt.timedelta(hours=6), end_hour=dt.timedelta(hours=20),
+                                       seed=args.seed)
+    study_case = itinerary_gen.generateStudyCaseRoundTrip(from_airport=airport_names[1 % args.airports],
+                                                          to_airport=airport_names[3 % args.airports])
+    start = time.perf_counter()
+    payload = CalendarInformationSC(processedAircraftData=[p.to_dict() for p in study_case]).dict()
+    validation_time = time.perf_counter() - start
+    aircraft_data = payload['processedAircraftData']
+    n_itineraries = sum(len(p['departureItineraryArray']) + len(p['returnItineraryArray']) for p in aircraft_data)
+    print(f'{args.aircrafts} aircrafts, {n_itineraries} itineraries (pydantic validation: {validation_time:.4f} s)')
+
+    results = {name: measure(build, aircraft_data, args.repeat) for name, build in LAYOUTS.items()}
+    for name, (build_time, memory) in results.items():
+        print(f'{name:>7}: construction {build_time:.4f} s | memory {memory / 2 ** 20:.3f} MB '
+              f'({memory / n_itineraries:.0f} B per itinerary)')
+    legacy, slots = results['legacy'], results['slots']
+    print(f'speed-up x{legacy[0] / slots[0]:.2f} | memory x{legacy[1] / slots[1]:.2f} less')
+
+
+if __name__ == "__main__":
+    main()
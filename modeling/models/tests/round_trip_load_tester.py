@@ -0,0 +1,131 @@
+"""
+Load test of the production server (app_prod.py): for every number of web workers the server is started,
+warmed up, and --clients concurrent clients post the same round trip problem during --duration seconds.
+Throughput and latency are reported per number of workers (the speed-up is bounded by the CPUs of the machine):
+
+    python -m modeling.models.tests.round_trip_load_tester --workers 1,2,4 --clients 8 --duration 20
+    python -m modeling.models.tests.round_trip_load_tester --url http://127.0.0.1:8000 --clients 8
+
+A running server should have RESULT_CACHE_SIZE=0: otherwise the repeated problem is answered from the cache.
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from app import project_path
+from modeling.models.tests.min_cost_round_trip_benchmark import generateStudyCase
+
+
+def startServer(n_workers: int, port: int, max_requests: int) -> subprocess.Popen:
+    # without result cache: every request is solved. Without sessions: they need a single worker
+    env = dict(os.environ, WEB_WORKERS=f'{n_workers}', API_PORT=f'{port}', WEB_WORKER_MAX_REQUESTS=f'{max_requests}',
+               RESULT_CACHE_SIZE='0', ROUTERS='opt,metrics')
+    return subprocess.Popen([sys.executable, 'app_prod.py'], cwd=project_path, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+
+
+def waitUntilReady(url: str, server: subprocess.Popen, timeout: float = 120):
+    # the workers only accept connections after their warm up (startup handlers)
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f'The server stopped with code {server.returncode}')
+        try:
+            if requests.get(f'{url}/docs', timeout=1).status_code == 200:
+                return time.perf_counter() - start
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f'The server at {url} is not ready after {timeout} s')
+
+
+def stopServer(server: subprocess.Popen):
+    server.send_signal(signal.SIGINT)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def runClients(url: str, body: bytes, n_clients: int, duration: float) -> dict:
+    latencies, errors = list(), list()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        with requests.Session() as session:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = session.post(f'{url}/opt/round-trip', data=body,
+                                            headers={'Content-Type': 'application/json'})
+                    ok = response.status_code == 200
+                except requests.RequestException:
+                    ok = False
+                with lock:
+                    (latencies if ok else errors).append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_clients) as executor:
+        for _ in range(n_clients):
+            executor.submit(client)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return dict(requests=len(latencies), errors=len(errors), throughput_rps=len(latencies) / elapsed,
+                p50_ms=statistics.median(latencies) * 1000 if latencies else None,
+                p95_ms=latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else None)
+
+
+def report(label: str, result: dict, baseline: dict = None):
+    speed_up = f" | speed-up x{result['throughput_rps'] / baseline['throughput_rps']:.2f}" \
+        if baseline and baseline['throughput_rps'] > 0 else ''
+    latency = f"p50 {result['p50_ms']:.1f} ms | p95 {result['p95_ms']:.1f} ms" if result['requests'] else 'no answers'
+    print(f"{label}: {result['throughput_rps']:.1f} req/s ({result['requests']} ok, {result['errors']} errors) | "
+          f"{latency}{speed_up}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round trip load test of the production server')
+    parser.add_argument('--workers', type=lambda v: [int(x) for x in v.split(',')], default=[1, 2, 4])
+    parser.add_argument('--url', default=None, help='test a running server instead of starting app_prod.py')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--max-requests', type=int, default=0, help='WEB_WORKER_MAX_REQUESTS of the server')
+    parser.add_argument('--aircrafts', type=int, default=5)
+    parser.add_argument('--days', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=77)
+    args = parser.parse_args()
+
+    study_case = generateStudyCase(args.aircrafts, 10, args.days, args.seed)
+    body = json.dumps(dict(processedAircraftData=[c.to_dict() for c in study_case], n_best=1), default=str).encode()
+
+    if args.url:
+        waitUntilReady(args.url, None)
+        report(args.url, runClients(args.url, body, args.clients, args.duration))
+        return
+
+    baseline = None
+    url = f'http://127.0.0.1:{args.port}'
+    for n_workers in args.workers:
+        server = startServer(n_workers, args.port, args.max_requests)
+        try:
+            ready_s = waitUntilReady(url, server)
+            result = runClients(url, body, args.clients, args.duration)
+        finally:
+            stopServer(server)
+        baseline = baseline or result
+        report(f'{n_workers} workers (ready in {ready_s:.1f} s)', result, baseline)
+
+
+if __name__ == "__main__":
+    main()
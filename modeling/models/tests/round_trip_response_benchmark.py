@@ -0,0 +1,66 @@
+"""
+Serialization time of the round trip answers: FastAPI response_model validation + jsonable_encoder + json
+(previous behaviour), the same validation rendered with orjson (VALIDATE_RESPONSES=true) and the answers
+rendered straight with orjson (default):
+
+    python -m modeling.models.tests.round_trip_response_benchmark --n-best 1,10,100,500
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.schemas.GLPKSchema import MinCostRoundTripAnswerSC
+from modeling.models import minCostRoundTripModel
+from modeling.models.tests.min_cost_round_trip_benchmark import generateStudyCase
+
+response_field = create_response_field(name='response', type_=List[MinCostRoundTripAnswerSC])
+
+
+def validated(answers: list, response_class):
+    content = asyncio.run(serialize_response(field=response_field, response_content=answers))
+    return response_class(jsonable_encoder(content)).body
+
+
+def serializeJson(answers: list):
+    return validated(answers, JSONResponse)
+
+
+def serializeValidatedOrjson(answers: list):
+    return validated(answers, ORJSONResponse)
+
+
+def serializeOrjson(answers: list):
+    return ORJSONResponse(answers).body
+
+
+SERIALIZERS = {'json': serializeJson, 'validated_orjson': serializeValidatedOrjson, 'orjson': serializeOrjson}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round trip answers serialization benchmark')
+    parser.add_argument('--n-best', type=lambda v: [int(x) for x in v.split(',')], default=[1, 10, 100, 500])
+    parser.add_argument('--seed', type=int, default=77)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    study_case = generateStudyCase(10, 10, 30, args.seed)
+    for n_best in args.n_best:
+        answers = [a.to_dict() for a in minCostRoundTripModel.run_direct_model(study_case, n_best=n_best)]
+        times = dict()
+        for name, serializer in SERIALIZERS.items():
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                serializer(answers)
+            times[name] = (time.perf_counter() - start) / args.repeat
+        print(f'{len(answers):>4} answers: ' + ' | '.join(f'{name}: {t * 1000:.2f} ms' for name, t in times.items()) +
+              f" | speed-up x{times['json'] / times['orjson']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
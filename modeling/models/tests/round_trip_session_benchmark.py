@@ -0,0 +1,53 @@
+"""
+Latency of a RoundTripSession update (the calendar of one aircraft changes) against solving the whole fleet
+again with the direct engine, for several fleet sizes:
+
+    python -m modeling.models.tests.round_trip_session_benchmark --aircrafts 10,20,40,80 --days 30
+"""
+import argparse
+import copy
+import time
+
+from modeling.models import minCostRoundTripModel
+from modeling.models.roundTripSession import RoundTripSession
+from modeling.models.tests.min_cost_round_trip_benchmark import generateStudyCase
+
+
+def best_time(fn, repeat: int):
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round trip session update benchmark')
+    parser.add_argument('--aircrafts', type=lambda v: [int(x) for x in v.split(',')], default=[10, 20, 40])
+    parser.add_argument('--airports', type=int, default=10)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--n-best', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=77)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for n_aircrafts in args.aircrafts:
+        study_case = generateStudyCase(n_aircrafts, args.airports, args.days, args.seed)
+        # the changed calendar: the one of another case with the code of the first aircraft
+        changed = copy.copy(generateStudyCase(1, args.airports, args.days, args.seed + 1)[0])
+        changed.processedAircraft = copy.copy(changed.processedAircraft)
+        changed.processedAircraft.aircraftCode = study_case[0].processedAircraft.aircraftCode
+        updated_case = [changed] + study_case[1:]
+
+        session = RoundTripSession(study_case, n_best=args.n_best)
+        create_time = best_time(lambda: RoundTripSession(study_case, n_best=args.n_best), args.repeat)
+        update_time = best_time(lambda: (session.setAircraft(changed), session.bestAnswers()), args.repeat)
+        full_time = best_time(lambda: minCostRoundTripModel.run_direct_model(updated_case, n_best=args.n_best),
+                              args.repeat)
+        print(f'{n_aircrafts:>4} aircrafts: session creation {create_time:.4f} s | update {update_time:.4f} s | '
+              f'full direct solve {full_time:.4f} s | speed-up x{full_time / update_time:.1f}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Cold start of the API: time to import app.main (what a new container or worker pays before serving) measured in
+fresh interpreters, and the heavy libraries that the import actually loaded. Exits with an error when the median
+is over the budget, so it can be used as a regression check:
+
+    python -m modeling.models.tests.startup_benchmark --repeat 5 --budget 0.8
+    ROUTERS=opt,metrics python -m modeling.models.tests.startup_benchmark
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from app import project_path
+
+HEAVY_MODULES = ['pyomo.environ', 'pandas', 'sqlalchemy', 'bcrypt']
+
+# a module imported with modeling.models.utils.lazyImport is only in sys.modules once it is used
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+loaded = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+print(json.dumps(dict(seconds=elapsed, loaded=loaded)))
+"""
+
+
+def importApp() -> dict:
+    result = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=project_path, capture_output=True, text=True,
+                            check=True)
+    # the last line: the app prints its own messages while it is imported
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time of the API')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=1.0, help='maximum median import time (seconds)')
+    args = parser.parse_args()
+
+    runs = [importApp() for _ in range(args.repeat)]
+    median = statistics.median(run['seconds'] for run in runs)
+    print(f"import app.main: median {median * 1000:.1f} ms | min {min(r['seconds'] for r in runs) * 1000:.1f} ms "
+          f"| max {max(r['seconds'] for r in runs) * 1000:.1f} ms ({args.repeat} runs)")
+    print(f"heavy libraries loaded: {', '.join(runs[-1]['loaded']) or 'none'}")
+    if median > args.budget:
+        print(f'Over the budget of {args.budget * 1000:.0f} ms')
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Writes a synthetic round trip study case to a file without holding it in memory, to replay large loads
+against the API:
+
+    python -m modeling.models.tests.study_case_writer --aircrafts 300 --airports 40 --days 180 --output case.json
+    python -m modeling.models.tests.study_case_writer --aircrafts 300 --days 180 --output case.jsonl --jsonl
+"""
+import argparse
+import datetime as dt
+import time
+
+from modeling.classes.ItineraryGenerator import ItineraryGenerator
+from modeling.models.utils import generateAircraftsAndAirports, writeCalendarJson, writeStudyCaseJsonl
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round trip study case writer')
+    parser.add_argument('--aircrafts', type=int, default=100)
+    parser.add_argument('--airports', type=int, default=20)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--n-best', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=77)
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--jsonl', action='store_true', help='one aircraft case per line instead of a request body')
+    args = parser.parse_args()
+
+    aircrafts, airport_names = generateAircraftsAndAirports(args.aircrafts, args.airports, seed=args.seed)
+    itinerary_gen = ItineraryGenerator(aircrafts=aircrafts, airport_names=airport_names, n_days=args.days,
+                                       start_hour=dt.timedelta(hours=6), end_hour=dt.timedelta(hours=20),
+                                       seed=args.seed)
+    aircraft_cases = itinerary_gen.iterStudyCaseRoundTrip(from_airport=airport_names[1 % args.airports],
+                                                          to_airport=airport_names[3 % args.airports])
+    start = time.perf_counter()
+    if args.jsonl:
+        n_cases = writeStudyCaseJsonl(aircraft_cases, args.output)
+    else:
+        n_cases = writeCalendarJson(aircraft_cases, args.output, n_best=args.n_best)
+    print(f'{n_cases} aircraft cases written in {args.output} ({time.perf_counter() - start:.2f} s)')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,73 @@
+from __future__ import annotations
+
+import importlib
+import json
 import random
-from random import uniform, randint
-from typing import List
-import pandas as pd
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+from random import randint
+from typing import Iterable, List, Optional, Union
+import numpy as np
 import datetime as dt
 
-import pyomo.environ as pm
-
 from modeling.classes.Aircraft import Aircraft
 from modeling.classes.ProcessedAircraftData import ProcessedAircraftData
 
+
+class _LazyModule(types.ModuleType):
+    """
+    Stand-in of a module that imports it on the first access to one of its attributes. The import is done under a
+    lock: importlib.util.LazyLoader is not thread-safe before Python 3.12 and the solver threads can race on it
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lock'] = threading.Lock()
+
+    def __getattr__(self, attribute: str):
+        with self._lock:
+            module = importlib.import_module(self.__name__)
+        value = getattr(module, attribute)
+        # the next accesses do not go through __getattr__
+        self.__dict__[attribute] = value
+        return value
+
+
+def lazyImport(name: str):
+    """
+    The module, imported on the first access to one of its attributes: Pyomo and pandas are only loaded by the
+    processes (and requests) that use them
+    """
+    return sys.modules.get(name) or _LazyModule(name)
+
+
+pd = lazyImport('pandas')
+pm = lazyImport('pyomo.environ')
+
 NON_SUCCESSFUL_SOLVER_SOLUTION_MSG = 'There is no optimal solution for this problem.'
 SUCCESSFUL_SOLVER_SOLUTION_MSG = 'Optimal solution found'
 
 
+@contextmanager
+def timeStage(stats: Optional[dict], stage: str):
+    # adds the seconds spent in the block to stats['stages'][stage], nothing when stats is None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stages = stats.setdefault('stages', dict())
+            stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - start
+
+
+def addCount(stats: Optional[dict], name: str, value):
+    if stats is not None:
+        stats[name] = stats.get(name, 0) + value
+
+
 def dataToDict(data: List[ProcessedAircraftData]) -> dict:
     resp = dict()
     for p in data:
@@ -34,67 +89,61 @@ def generateAircraftsAndAirports(n_aircrafts, n_airports, seed=None):
     return aircrafts, airports
 
 
-def generateSpeedKmH(aircrafts, seed=None):
-    if seed is not None:
-        random.seed(seed)
-    speed = {}
+def numpyGenerator(seed=None, rng: np.random.Generator = None) -> np.random.Generator:
+    return rng if rng is not None else np.random.default_rng(seed)
+
+
+def symmetricMatrix(upper: np.ndarray) -> np.ndarray:
+    # symmetric matrices (with zero diagonal) from the upper triangle of the last two axes
+    upper = np.triu(upper, k=1)
+    return upper + np.swapaxes(upper, -1, -2)
+
+
+def generateSpeedKmH(aircrafts, seed=None, rng: np.random.Generator = None, as_dict=True):
+    rng = numpyGenerator(seed, rng)
     # km/h
-    for ac in aircrafts:
-        speed[ac] = 400 + 400 * uniform(0, 1)
-    return speed
+    speed = 400 + 400 * rng.uniform(0, 1, size=len(aircrafts))
+    return dict(zip(aircrafts, speed)) if as_dict else speed
 
 
-def generateDistanceMatrixKm(airports, seed=None):
-    if seed is not None:
-        random.seed(seed)
+def generateDistanceMatrixKm(airports, seed=None, rng: np.random.Generator = None, as_frame=False):
+    rng = numpyGenerator(seed, rng)
     # distance matrix: km
-    df_dist = pd.DataFrame(index=airports, columns=airports)
-    for ap_i in airports:
-        for ap_j in airports:
-            dist = 0 if ap_i == ap_j else randint(400, 1500)
-            df_dist[ap_i].loc[ap_j] = dist
-            df_dist[ap_j].loc[ap_i] = dist
-    return df_dist
-
-
-def generateTimeTripInMinutes(speed: dict, df_dist: pd.DataFrame, airports: list):
-    aircrafts = speed.keys()
-    time = {}
-    for ac in aircrafts:
-        df_time = pd.DataFrame(index=airports, columns=airports)
-        for a_i in airports:
-            for a_j in airports:
-                t = round(df_dist[a_i][a_j] / (speed[ac] * (1 / 60)), 2)
-                df_time[a_i][a_j] = t
-                df_time[a_j][a_i] = t
-            time[ac] = df_time
+    n_airports = len(airports)
+    dist = symmetricMatrix(rng.integers(400, 1500, size=(n_airports, n_airports), endpoint=True).astype(np.float64))
+    return pd.DataFrame(dist, index=airports, columns=airports) if as_frame else dist
+
+
+def generateTimeTripInMinutes(speed: Union[dict, np.ndarray], dist: Union[pd.DataFrame, np.ndarray], airports: list,
+                              as_frame=False):
+    # time tensor (aircraft, airport, airport) in minutes, or a dict of DataFrames per aircraft if as_frame
+    if as_frame and not isinstance(speed, dict):
+        raise ValueError('as_frame needs the speed as a dict: its aircraft label the DataFrames')
+    speed_km_min = np.fromiter(speed.values(), dtype=np.float64) / 60 if isinstance(speed, dict) else speed / 60
+    dist = dist.to_numpy(dtype=np.float64) if isinstance(dist, pd.DataFrame) else dist
+    time = np.round(dist[None, :, :] / speed_km_min[:, None, None], 2)
+    if as_frame:
+        return {ac: pd.DataFrame(time[ix], index=airports, columns=airports) for ix, ac in enumerate(speed.keys())}
     return time
 
 
-def generateCostTrip(aircrafts: list, airports: list, seed=None):
-    if seed is not None:
-        random.seed(seed)
-    cost = {}
-    for ac in aircrafts:
-        df_cost = pd.DataFrame(index=airports, columns=airports)
-        for a_i in airports:
-            for a_j in airports:
-                c = 0 if a_i == a_j else round(50 + 50 * uniform(0, 1), 2)
-                df_cost[a_i].loc[a_j] = c
-                df_cost[a_j].loc[a_i] = c
-
-        cost[ac] = df_cost
+def generateCostTrip(aircrafts: list, airports: list, seed=None, rng: np.random.Generator = None, as_frame=False):
+    rng = numpyGenerator(seed, rng)
+    # cost tensor (aircraft, airport, airport), or a dict of DataFrames per aircraft if as_frame
+    n_airports = len(airports)
+    cost = symmetricMatrix(np.round(50 + 50 * rng.uniform(0, 1, size=(len(aircrafts), n_airports, n_airports)), 2))
+    if as_frame:
+        return {ac: pd.DataFrame(cost[ix], index=airports, columns=airports) for ix, ac in enumerate(aircrafts)}
     return cost
 
 
-def generateParameters(aircrafts, airports, seed=None):
-    if seed is not None:
-        random.seed(seed)
-    speed_dict = generateSpeedKmH(aircrafts, seed)
-    df_dist = generateDistanceMatrixKm(airports, seed)
-    time_dict = generateTimeTripInMinutes(speed_dict, df_dist, airports)
-    cost_dict = generateCostTrip(aircrafts, airports, seed)
-    return speed_dict, df_dist, time_dict, cost_dict
+def generateParameters(aircrafts, airports, seed=None, as_frame=True):
+    rng = numpyGenerator(seed)
+    speed_dict = generateSpeedKmH(aircrafts, rng=rng)
+    dist = generateDistanceMatrixKm(airports, rng=rng, as_frame=as_frame)
+    time = generateTimeTripInMinutes(speed_dict, dist, airports, as_frame=as_frame)
+    cost = generateCostTrip(aircrafts, airports, rng=rng, as_frame=as_frame)
+    return speed_dict, dist, time, cost
 
 
 def generateDayValidPeriodsPerDay(n_days,
@@ -115,6 +164,38 @@ def generateDayValidPeriodsPerDay(n_days,
     return df_days
 
 
+def writeStudyCaseJsonl(aircraft_cases: Iterable[ProcessedAircraftData], file_path: str) -> int:
+    """ one ProcessedAircraftDataSC object per line, written as the aircraft cases are generated """
+    n_cases = 0
+    with open(file_path, 'w') as f:
+        for aircraft_case in aircraft_cases:
+            f.write(json.dumps(aircraft_case.to_dict(), separators=(',', ':')))
+            f.write('\n')
+            n_cases += 1
+    return n_cases
+
+
+def writeCalendarJson(aircraft_cases: Iterable[ProcessedAircraftData], file_path: str, n_best: int = 1) -> int:
+    """ CalendarInformationSC document (the round trip request body) streamed one aircraft case at a time """
+    n_cases = 0
+    with open(file_path, 'w') as f:
+        f.write('{"processedAircraftData":[')
+        for aircraft_case in aircraft_cases:
+            if n_cases > 0:
+                f.write(',')
+            f.write(json.dumps(aircraft_case.to_dict(), separators=(',', ':')))
+            n_cases += 1
+        f.write(f'],"n_best":{n_best}}}')
+    return n_cases
+
+
+def readStudyCaseJsonl(file_path: str) -> Iterable[ProcessedAircraftData]:
+    with open(file_path) as f:
+        for line in f:
+            if line.strip():
+                yield ProcessedAircraftData.from_dict(json.loads(line))
+
+
 def is_valid_solution(solver_results):
     return solver_results['Solver'][0]['Termination condition'] == 'optimal'
 